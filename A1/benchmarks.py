@@ -0,0 +1,85 @@
+"""
+Benchmarks for comparing the speed of solvers.
+
+Run this module directly to print every benchmark.
+"""
+import os
+import random
+import tempfile
+import time
+from typing import List
+from games import Chopsticks
+from solvers import SubSquareTable, NumpySubSquareTable, numpy
+
+
+def random_playout(game: Chopsticks, limit: int) -> int:
+    """
+    Play random moves from the current state of game until it is over or
+    limit moves have been made, without changing game, and return the number
+    of moves made.
+
+    >>> random_playout(Chopsticks(True), 0)
+    0
+    """
+    state = game.current_state
+    moves = 0
+    while moves < limit and not game.is_over(state):
+        state = state.make_move(random.choice(state.get_possible_moves()))
+        moves += 1
+    return moves
+
+
+def benchmark_chopsticks(playouts: int = 10000, limit: int = 100) -> None:
+    """
+    Print the number of random Chopsticks playouts, each stopped after limit
+    moves since positions repeat, and of moves made per second, through the
+    ChopState methods and through ChopState.random_playout.
+    """
+    game = Chopsticks(True)
+    print("Random Chopsticks playouts of at most {} moves".format(limit))
+    print("{:<12}{:>14}{:>14}".format("moves on", "playouts/s", "moves/s"))
+    for name, playout in [
+            ("states", lambda: random_playout(game, limit)),
+            ("codes", lambda: game.current_state.random_playout(limit)[1])]:
+        start = time.perf_counter()
+        moves = sum([playout() for _ in range(playouts)])
+        elapsed = time.perf_counter() - start
+        print("{:<12}{:>14.0f}{:>14.0f}".format(name, playouts / elapsed,
+                                                moves / elapsed))
+
+
+def benchmark_subsquare(sizes: List[int] = None) -> None:
+    """
+    Print the seconds taken to work out the Subtract Square table of each
+    size in pure Python and with NumPy, and to load the NumPy table back
+    from its file.
+    """
+    sizes = [10 ** 5, 10 ** 6, 10 ** 7] if sizes is None else sizes
+    print("Seconds to solve Subtract Square{}".format(
+        "" if numpy is not None else " (NumPy is not installed)"))
+    print("{:<12}{:>10}{:>12}{:>10}{:>10}".format(
+        "values", "losses", "python", "numpy", "load"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            start = time.perf_counter()
+            table = SubSquareTable(size)
+            python = time.perf_counter() - start
+            solved, load = float("nan"), float("nan")
+            if numpy is not None:
+                path = os.path.join(directory, "{}.npy".format(size))
+                start = time.perf_counter()
+                NumpySubSquareTable(path).grow(size - 1)
+                solved = time.perf_counter() - start
+                start = time.perf_counter()
+                loaded = NumpySubSquareTable(path)
+                load = time.perf_counter() - start
+                assert bytes(loaded.wins[:size]) == bytes(table.wins[:size])
+                # releasing the memory map so the directory can be removed
+                del loaded
+            print("{:<12}{:>10}{:>12.2f}{:>10.2f}{:>10.4f}".format(
+                size, len(table.losses), python, solved, load))
+
+
+if __name__ == "__main__":
+    benchmark_chopsticks()
+    benchmark_subsquare()
@@ -1,12 +1,15 @@
 from strategy import *
 from typing import Any, Callable
 from games import *
+from solvers import chopsticks_solver_strategy, subsquare_solver_strategy
 
 playable_games = {'s': SubSquare,
                   'c': Chopsticks}
 
 usable_strategies = {'r': random_strategy,
-                     'i': interactive_strategy}
+                     'i': interactive_strategy,
+                     'cs': chopsticks_solver_strategy,
+                     'ss': subsquare_solver_strategy}
 
 
 class GameInterface:
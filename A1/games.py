@@ -3,8 +3,21 @@ Contains Game superclass with Chopsticks and Subtract Square subclasses as well
 as GameState superclass with Chopsticks and Subtract Square state subclasses.
 """
 
+import math
+import random
 from typing import *
 
+# random 64-bit keys of each number of fingers on each hand, with hands in the
+# order p1_left, p1_right, p2_left, p2_right, and of player 1 being the one to
+# move, for hashing ChopStates
+_KEYS = random.Random(0)
+CHOP_KEYS = [[_KEYS.getrandbits(64) for _ in range(5)] for _ in range(4)]
+CHOP_TURN_KEY = _KEYS.getrandbits(64)
+# odd 64-bit multiplier spreading Subtract Square values over 64 bits, and key
+# of player 1 being the one to move, for hashing SubSquareStates
+SUBSQUARE_MULTIPLIER = 0x9E3779B97F4A7C15
+SUBSQUARE_TURN_KEY = _KEYS.getrandbits(64)
+
 
 class Game:
     """
@@ -64,6 +77,21 @@ class Game:
         """
         raise NotImplementedError("Override this.")
 
+    def score(self, state: 'GameState', player: str) -> int:
+        """
+        Returns 1 if player has won the game at state, -1 if player has lost
+        and 0 otherwise, without changing current_state, so that searches
+        can share Game self.
+
+        >>> c = Chopsticks(True)
+        >>> s = c.current_state
+        >>> s.p1_left, s.p1_right = 0, 0
+        >>> c.score(s, 'p1'), c.score(s, 'p2')
+        (-1, 1)
+        """
+        value = state.terminal_value()
+        return value if state.get_current_player_name() == player else -value
+
     def str_to_move(self, string: str) -> Any:
         """
         Returns a valid move based on string.
@@ -144,11 +172,7 @@ class Chopsticks(Game):
         >>> c.is_over(c.current_state)
         False
         """
-        if current_state.p1_left == 0 and current_state.p1_right == 0:
-            return True
-        elif current_state.p2_left == 0 and current_state.p2_right == 0:
-            return True
-        return False
+        return CHOP_OVER[current_state.code]
 
     def is_winner(self, player: str) -> bool:
         """
@@ -158,12 +182,7 @@ class Chopsticks(Game):
         >>> c.is_winner('p1')
         False
         """
-        if not self.is_over(self.current_state):
-            return False
-        elif self.current_state.current_player == player:
-            return False
-        else:
-            return True
+        return self.score(self.current_state, player) == 1
 
     def str_to_move(self, string: str) -> Any:
         """
@@ -191,15 +210,19 @@ class SubSquare(Game):
     instructions: str
     player1_start: bool
 
-    def __init__(self, player1_start: bool) -> None:
+    def __init__(self, player1_start: bool, start_value: int = None) -> None:
         """
-        Initializes a new game of Subtract Square
+        Initializes a new game of Subtract Square, asking for the starting
+        value through input unless start_value is given.
 
-        ~No Docstests provided as they rely on input~
+        >>> SubSquare(True, 10).current_state.get_possible_moves()
+        [1, 4, 9]
         """
         Game.__init__(self, player1_start)
         self.current_state = SubSquareState(player1_start)
-        self.current_state.current_val = int(input("Enter a starting value:"))
+        if start_value is None:
+            start_value = int(input("Enter a starting value:"))
+        self.current_state.current_val = start_value
         self.instructions = "A positive whole number is chosen as " \
                             "the starting value by some entity. In " \
                             "our case, one of the players will pick a " \
@@ -244,14 +267,12 @@ class SubSquare(Game):
         """
         Returns whether or not player is the winner of a finished game.
 
-        ~No Docstests provided as they rely on input~
+        >>> s = SubSquare(True, 4)
+        >>> s.current_state = s.current_state.make_move(4)
+        >>> s.is_winner('p1'), s.is_winner('p2')
+        (True, False)
         """
-        if not self.is_over(self.current_state):
-            return False
-        elif self.current_state.current_player == player:
-            return False
-        else:
-            return True
+        return self.score(self.current_state, player) == 1
 
     def str_to_move(self, string: str) -> Any:
         """
@@ -318,6 +339,29 @@ class GameState:
         """
         raise NotImplementedError("Override this.")
 
+    def terminal_value(self) -> int:
+        """
+        Returns 1 if the current player has won the game at GameState self,
+        -1 if they have lost and 0 if the game is not over.
+        """
+        raise NotImplementedError("Override this.")
+
+    def apply(self, move: Any) -> Any:
+        """
+        Applies move to GameState self in place, and returns a token which
+        undo takes to restore self. Optional: searches can call it instead of
+        make_move to walk a game tree on a single state.
+        """
+        raise NotImplementedError("Override this.")
+
+    def undo(self, token: Any) -> None:
+        """
+        Takes back the move applied to GameState self by the apply call which
+        returned token. Moves must be taken back in the reverse order they
+        were applied.
+        """
+        raise NotImplementedError("Override this.")
+
     def get_possible_moves(self) -> [object]:
         """
         Returns the possible moves based on the current game state.
@@ -325,24 +369,100 @@ class GameState:
         raise NotImplementedError("Override this.")
 
 
+# moves of Chopsticks, numbered by their position in CHOP_MOVES
+CHOP_MOVES = ('ll', 'lr', 'rl', 'rr')
+# number of integer codes of ChopStates
+CHOP_CODES = 2 * 5 ** 4
+
+
+def chop_code(p1_left: int, p1_right: int, p2_left: int, p2_right: int,
+              p1_turn: bool) -> int:
+    """
+    Returns the integer code, from 0 to CHOP_CODES - 1, of the ChopState with
+    the given hands and player to move.
+
+    >>> chop_code(1, 1, 1, 1, True)
+    312
+    """
+    return (((p1_left * 5 + p1_right) * 5 + p2_left) * 5 + p2_right) * 2 + \
+        (0 if p1_turn else 1)
+
+
+def chop_hands(code: int) -> List[int]:
+    """
+    Returns the hands p1_left, p1_right, p2_left, p2_right of the ChopState
+    with the given code.
+
+    >>> chop_hands(chop_code(0, 4, 2, 1, False))
+    [0, 4, 2, 1]
+    """
+    return [code // 250, code // 50 % 5, code // 10 % 5, code // 2 % 5]
+
+
+def _chop_tables() -> Tuple[List[int], List[int], List[List[str]],
+                            List[List[int]], List[bool], List[int]]:
+    """
+    Returns, for each ChopState code, the codes reached by each move, the
+    bitmask of its legal moves, the list of its legal moves and of their
+    numbers, whether the game is over and its Zobrist hash, all worked out
+    once from the rules.
+    """
+    following, legal, moves, numbers, over, hashes = [], [], [], [], [], []
+    for code in range(CHOP_CODES):
+        hands = chop_hands(code)
+        p1_turn = code % 2 == 0
+        mover, target = (0, 2) if p1_turn else (2, 0)
+        over.append(hands[0] == hands[1] == 0 or hands[2] == hands[3] == 0)
+        mask = 0
+        for i, move in enumerate(CHOP_MOVES):
+            hand = mover + (move[0] == 'r')
+            touched = target + (move[1] == 'r')
+            new_hands = hands.copy()
+            # a hand reaching five fingers dies, and one passing five wraps
+            new_hands[touched] = (hands[touched] + hands[hand]) % 5
+            following.append(chop_code(*new_hands, not p1_turn))
+            if not over[-1] and hands[hand] != 0 and hands[touched] != 0:
+                mask |= 1 << i
+        legal.append(mask)
+        numbers.append([i for i in range(len(CHOP_MOVES)) if mask >> i & 1])
+        moves.append([CHOP_MOVES[i] for i in numbers[-1]])
+        zobrist = CHOP_TURN_KEY if p1_turn else 0
+        for keys, hand in zip(CHOP_KEYS, hands):
+            zobrist ^= keys[hand]
+        hashes.append(zobrist)
+    return following, legal, moves, numbers, over, hashes
+
+
+# code reached by each move from each ChopState code, at CHOP_NEXT[code * 4 +
+# move number], legal moves of each code as a bitmask, a list and a list of
+# move numbers, whether the game is over at each code, and the Zobrist hash of
+# each code
+CHOP_NEXT, CHOP_LEGAL, CHOP_MOVE_LISTS, CHOP_MOVE_NUMBERS, CHOP_OVER, \
+    CHOP_HASHES = _chop_tables()
+# move number of each move, any other move being treated as 'rr'
+CHOP_MOVE_INDEX = {move: i for i, move in enumerate(CHOP_MOVES)}
+
+
 class ChopState(GameState):
     """
     Keeps track of the game state of a game of Chopsticks. A subclass of
     GameState Overrides __eq__, __str__, is_valid_move, make_move, and
     get_possible_moves. Extends __init__.
 
+    The whole state is stored as its integer code, so that moves are looked
+    up in the precomputed CHOP_NEXT rather than worked out. The hands and
+    current player are read and assigned through the code.
+
     ===Attributes===
     p1_left: player 1's left hand value
     p1_right: player 1's right hand value
     p2_left: player 2's left hand value
     p2_right: player 2's right hand value
     current_player: the player whose turn it is
+    code: integer code of the hands and player to move
+    zobrist: 64-bit hash of the hands and player to move
     """
-    p1_left: int
-    p1_right: int
-    p2_left: int
-    p2_right: int
-    current_player: str
+    code: int
 
     def __init__(self, player1_start: bool) -> None:
         """
@@ -352,11 +472,60 @@ class ChopState(GameState):
         >>> cS.p1_left
         1
         """
+        self.code = chop_code(1, 1, 1, 1, True)
         GameState.__init__(self, player1_start)
-        self.p1_left = 1
-        self.p1_right = 1
-        self.p2_left = 1
-        self.p2_right = 1
+
+    def _get_hand(self, hand: int) -> int:
+        """
+        Returns the value of hand, numbered in the order p1_left, p1_right,
+        p2_left, p2_right.
+        """
+        return self.code // (250, 50, 10, 2)[hand] % 5
+
+    def _set_hand(self, hand: int, value: int) -> None:
+        """
+        Sets the value of hand, numbered as in _get_hand, to value.
+
+        Precondition: 0 <= value <= 4
+        """
+        weight = (250, 50, 10, 2)[hand]
+        self.code += (value - self.code // weight % 5) * weight
+
+    p1_left = property(lambda self: self._get_hand(0),
+                       lambda self, value: self._set_hand(0, value))
+    p1_right = property(lambda self: self._get_hand(1),
+                        lambda self, value: self._set_hand(1, value))
+    p2_left = property(lambda self: self._get_hand(2),
+                       lambda self, value: self._set_hand(2, value))
+    p2_right = property(lambda self: self._get_hand(3),
+                        lambda self, value: self._set_hand(3, value))
+
+    @property
+    def current_player(self) -> str:
+        """
+        Returns the player whose turn it is.
+
+        >>> ChopState(False).current_player
+        'p2'
+        """
+        return 'p1' if self.code % 2 == 0 else 'p2'
+
+    @current_player.setter
+    def current_player(self, player: str) -> None:
+        """
+        Sets the player whose turn it is to player.
+        """
+        self.code += (player != 'p1') - self.code % 2
+
+    @property
+    def zobrist(self) -> int:
+        """
+        Returns the Zobrist hash of ChopState self, looked up from its code.
+
+        >>> ChopState(True).zobrist == ChopState(True).compute_zobrist()
+        True
+        """
+        return CHOP_HASHES[self.code]
 
     def __str__(self) -> str:
         """
@@ -367,8 +536,7 @@ class ChopState(GameState):
         Player 1: Left 1 - 1 Right; Player 2: Left 1 - 1 Right
         """
         return 'Player 1: Left {} - {} Right; Player 2: Left {} - ' \
-               '{} Right'.format(self.p1_left, self.p1_right,
-                                 self.p2_left, self.p2_right)
+               '{} Right'.format(*chop_hands(self.code))
 
     def __eq__(self, other: Any) -> bool:
         """
@@ -382,10 +550,31 @@ class ChopState(GameState):
         >>> c == ran
         False
         """
-        return (type(self) == type(other) and self.p1_left == other.p1_left
-                and self.p1_right == other.p1_right and self.p2_left ==
-                other.p2_left and self.p2_right == other.p2_right and
-                self.current_player == other.current_player)
+        return type(self) == type(other) and self.code == other.code
+
+    def __hash__(self) -> int:
+        """
+        Returns the Zobrist hash of ChopState self.
+
+        >>> hash(ChopState(True).make_move('ll')) == hash(ChopState(True)
+        ...                                               .make_move('rl'))
+        True
+        """
+        return CHOP_HASHES[self.code]
+
+    def compute_zobrist(self) -> int:
+        """
+        Returns the Zobrist hash of ChopState self computed from its hands
+        rather than looked up.
+
+        >>> cS = ChopState(True).make_move('lr').make_move('rl')
+        >>> cS.compute_zobrist() == cS.zobrist
+        True
+        """
+        zobrist = CHOP_TURN_KEY if self.current_player == 'p1' else 0
+        for keys, hand in zip(CHOP_KEYS, chop_hands(self.code)):
+            zobrist ^= keys[hand]
+        return zobrist
 
     def is_valid_move(self, move: str) -> bool:
         """
@@ -397,10 +586,8 @@ class ChopState(GameState):
         >>> cS.is_valid_move('abc')
         False
         """
-        for m in self.get_possible_moves():
-            if m == move:
-                return True
-        return False
+        return move in CHOP_MOVE_INDEX and \
+            CHOP_LEGAL[self.code] >> CHOP_MOVE_INDEX[move] & 1 == 1
 
     def make_move(self, move: str) -> object:
         """
@@ -412,84 +599,47 @@ class ChopState(GameState):
         >>> print(cS.make_move('ll'))
         Player 1: Left 1 - 1 Right; Player 2: Left 2 - 1 Right
         """
-        if self.current_player == 'p1':
-            new_state = ChopState(False)
-            new_state.p1_left = self.p1_left
-            new_state.p1_right = self.p1_right
-            new_state.p2_left = self.p2_left
-            new_state.p2_right = self.p2_right
-
-            if move == 'll':
-                new_state.p2_left += new_state.p1_left
-
-                if new_state.p2_left == 5:
-                    new_state.p2_left = 0
-                elif new_state.p2_left > 5:
-                    new_state.p2_left %= 5
-                return new_state
-            elif move == 'lr':
-                new_state.p2_right += new_state.p1_left
-
-                if new_state.p2_right == 5:
-                    new_state.p2_right = 0
-                elif new_state.p2_right > 5:
-                    new_state.p2_right %= 5
-                return new_state
-            elif move == 'rl':
-                new_state.p2_left += new_state.p1_right
-
-                if new_state.p2_left == 5:
-                    new_state.p2_left = 0
-                elif new_state.p2_left > 5:
-                    new_state.p2_left %= 5
-                return new_state
-            else:
-                new_state.p2_right += new_state.p1_right
-
-                if new_state.p2_right == 5:
-                    new_state.p2_right = 0
-                elif new_state.p2_right > 5:
-                    new_state.p2_right %= 5
-                return new_state
-        else:
-            new_state = ChopState(True)
-            new_state.p1_left = self.p1_left
-            new_state.p1_right = self.p1_right
-            new_state.p2_left = self.p2_left
-            new_state.p2_right = self.p2_right
-
-            if move == 'll':
-                new_state.p1_left += new_state.p2_left
-
-                if new_state.p1_left == 5:
-                    new_state.p1_left = 0
-                elif new_state.p1_left > 5:
-                    new_state.p1_left %= 5
-                return new_state
-            elif move == 'lr':
-                new_state.p1_right += new_state.p2_left
-
-                if new_state.p1_right == 5:
-                    new_state.p1_right = 0
-                elif new_state.p1_right > 5:
-                    new_state.p1_right %= 5
-                return new_state
-            elif move == 'rl':
-                new_state.p1_left += new_state.p2_right
-
-                if new_state.p1_left == 5:
-                    new_state.p1_left = 0
-                elif new_state.p1_left > 5:
-                    new_state.p1_left %= 5
-                return new_state
-            else:
-                new_state.p1_right += new_state.p2_right
-
-                if new_state.p1_right == 5:
-                    new_state.p1_right = 0
-                elif new_state.p1_right > 5:
-                    new_state.p1_right %= 5
-                return new_state
+        new_state = ChopState.__new__(ChopState)
+        new_state.code = CHOP_NEXT[self.code * 4 +
+                                   CHOP_MOVE_INDEX.get(move, 3)]
+        return new_state
+
+    def terminal_value(self) -> int:
+        """
+        Returns -1 if the game is over at ChopState self, since the player to
+        move has two dead hands, and 0 otherwise.
+
+        >>> cS = ChopState(True)
+        >>> cS.terminal_value()
+        0
+        >>> cS.p1_left, cS.p1_right = 0, 0
+        >>> cS.terminal_value()
+        -1
+        """
+        return -1 if CHOP_OVER[self.code] else 0
+
+    def apply(self, move: str) -> int:
+        """
+        Applies move to ChopState self in place, and returns the code self
+        had, which undo restores.
+
+        >>> cS = ChopState(True)
+        >>> token = cS.apply('ll')
+        >>> cS == ChopState(True).make_move('ll')
+        True
+        >>> cS.undo(token)
+        >>> cS == ChopState(True)
+        True
+        """
+        token = self.code
+        self.code = CHOP_NEXT[token * 4 + CHOP_MOVE_INDEX.get(move, 3)]
+        return token
+
+    def undo(self, token: int) -> None:
+        """
+        Takes back the move applied by the apply call which returned token.
+        """
+        self.code = token
 
     def get_possible_moves(self) -> [str]:
         """
@@ -502,64 +652,31 @@ class ChopState(GameState):
         >>> cS.get_possible_moves()
         ['rl', 'rr']
         """
-        if self.current_player == 'p1':
-            if (self.p1_left != 0 and self.p1_right != 0 and self.p2_left != 0
-                    and self.p2_right != 0):
-                return ['ll', 'lr', 'rl', 'rr']
-            elif (self.p1_left == 0 and self.p1_right != 0 and
-                  self.p2_left != 0 and self.p2_right != 0):
-                return ['rl', 'rr']
-            elif (self.p1_left == 0 and self.p1_right != 0 and
-                  self.p2_left == 0 and self.p2_right != 0):
-                return ['rr']
-            elif (self.p1_left == 0 and self.p1_right != 0 and
-                  self.p2_left != 0 and self.p2_right == 0):
-                return ['rl']
-            elif (self.p1_left != 0 and self.p1_right == 0 and
-                  self.p2_left != 0 and self.p2_right != 0):
-                return ['ll', 'lr']
-            elif (self.p1_left != 0 and self.p1_right == 0 and
-                  self.p2_left == 0 and self.p2_right != 0):
-                return ['lr']
-            elif (self.p1_left != 0 and self.p1_right == 0 and
-                  self.p2_left != 0 and self.p2_right == 0):
-                return ['ll']
-            elif (self.p1_left != 0 and self.p1_right != 0 and
-                  self.p2_left == 0 and self.p2_right != 0):
-                return ['lr', 'rr']
-            elif (self.p1_left != 0 and self.p1_right != 0 and
-                  self.p2_left != 0 and self.p2_right == 0):
-                return ['ll', 'rl']
-            return []
-        elif self.current_player == 'p2':
-            if (self.p2_left != 0 and self.p2_right != 0 and self.p1_left != 0
-                    and self.p1_right != 0):
-                return ['ll', 'lr', 'rl', 'rr']
-            elif (self.p2_left == 0 and self.p2_right != 0 and
-                  self.p1_left != 0 and self.p1_right != 0):
-                return ['rl', 'rr']
-            elif (self.p2_left == 0 and self.p2_right != 0 and
-                  self.p1_left == 0 and self.p1_right != 0):
-                return ['rr']
-            elif (self.p2_left == 0 and self.p2_right != 0 and
-                  self.p1_left != 0 and self.p1_right == 0):
-                return ['rl']
-            elif (self.p2_left != 0 and self.p2_right == 0 and
-                  self.p1_left != 0 and self.p1_right != 0):
-                return ['ll', 'lr']
-            elif (self.p2_left != 0 and self.p2_right == 0 and
-                  self.p1_left == 0 and self.p1_right != 0):
-                return ['lr']
-            elif (self.p2_left != 0 and self.p2_right == 0 and
-                  self.p1_left != 0 and self.p1_right == 0):
-                return ['ll']
-            elif (self.p2_left != 0 and self.p2_right != 0 and
-                  self.p1_left == 0 and self.p1_right != 0):
-                return ['lr', 'rr']
-            elif (self.p2_left != 0 and self.p2_right != 0 and
-                  self.p1_left != 0 and self.p1_right == 0):
-                return ['ll', 'rl']
-            return []
+        return CHOP_MOVE_LISTS[self.code].copy()
+
+    def random_playout(self, limit: int) -> Tuple['ChopState', int]:
+        """
+        Returns the state reached by playing random moves from ChopState self
+        until the game is over or limit moves have been made, and the number
+        of moves made. Moves are made on codes alone, without creating a
+        state for each one.
+
+        >>> ChopState(True).random_playout(0)[1]
+        0
+        >>> cS = ChopState(True)
+        >>> cS.p1_left, cS.p1_right = 0, 0
+        >>> cS.random_playout(10)[1]
+        0
+        """
+        code, moves = self.code, 0
+        rand = random.random
+        while moves < limit and not CHOP_OVER[code]:
+            numbers = CHOP_MOVE_NUMBERS[code]
+            code = CHOP_NEXT[code * 4 + numbers[int(rand() * len(numbers))]]
+            moves += 1
+        new_state = ChopState.__new__(ChopState)
+        new_state.code = code
+        return new_state, moves
 
 
 class SubSquareState(GameState):
@@ -600,6 +717,37 @@ class SubSquareState(GameState):
                 self.current_val == other.current_val and
                 self.current_player == other.current_player)
 
+    def __hash__(self) -> int:
+        """
+        Returns the Zobrist-style hash of SubSquareState self.
+
+        >>> ss = SubSquareState(True)
+        >>> ss.current_val = 10
+        >>> hash(ss.make_move(9)) == hash(ss.make_move(4).make_move(4)
+        ...                               .make_move(1))
+        True
+        """
+        return self.zobrist
+
+    @property
+    def zobrist(self) -> int:
+        """
+        Returns a 64-bit hash of the current value and player to move. The
+        value is a single integer, so the hash is computed from it directly
+        rather than kept up to date by make_move.
+
+        >>> ss = SubSquareState(False)
+        >>> ss.current_val = 5
+        >>> ss.zobrist == ss.make_move(4).make_move(1).zobrist
+        False
+        >>> ss.zobrist < 2 ** 64
+        True
+        """
+        zobrist = (int(self.current_val or 0) *
+                   SUBSQUARE_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF
+        return zobrist ^ SUBSQUARE_TURN_KEY if self.current_player == 'p1' \
+            else zobrist
+
     def __str__(self) -> str:
         """
         Returns a string representation of self.
@@ -628,13 +776,50 @@ class SubSquareState(GameState):
             new_state.current_val = self.current_val - move
             return new_state
 
+    def terminal_value(self) -> int:
+        """
+        Returns -1 if the value of SubSquareState self is 0, since the player
+        to move has no square left to subtract, and 0 otherwise.
+
+        >>> ss = SubSquareState(True)
+        >>> ss.current_val = 0
+        >>> ss.terminal_value()
+        -1
+        """
+        return -1 if self.current_val == 0 else 0
+
+    def apply(self, move: int) -> int:
+        """
+        Subtracts move from the value of SubSquareState self in place and
+        passes the turn, returning move as the token undo takes.
+
+        >>> ss = SubSquareState(True)
+        >>> ss.current_val = 10
+        >>> token = ss.apply(9)
+        >>> ss.current_val, ss.current_player
+        (1, 'p2')
+        >>> ss.undo(token)
+        >>> ss.current_val, ss.current_player
+        (10, 'p1')
+        """
+        self.current_val -= move
+        self.current_player = 'p2' if self.current_player == 'p1' else 'p1'
+        return move
+
+    def undo(self, token: int) -> None:
+        """
+        Takes back the move applied by the apply call which returned token.
+        """
+        self.current_val += token
+        self.current_player = 'p2' if self.current_player == 'p1' else 'p1'
+
     def get_possible_moves(self) -> [int]:
         """
         Returns list of possible moves based on the current game state.
+
+        >>> ss = SubSquareState(True)
+        >>> ss.current_val = 10
+        >>> ss.get_possible_moves()
+        [1, 4, 9]
         """
-        i = 1
-        poss = []
-        while i ** 2 <= int(self.current_val):
-            poss.append(i ** 2)
-            i += 1
-        return poss
+        return [i * i for i in range(1, math.isqrt(int(self.current_val)) + 1)]
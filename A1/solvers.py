@@ -0,0 +1,413 @@
+"""
+Solvers which work out the result of every position of a game ahead of time,
+and strategies which play from their solutions.
+"""
+
+import math
+import os
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple, Union
+from games import Game, Chopsticks, ChopState, CHOP_CODES
+try:
+    import numpy
+except ImportError:
+    # the NumPy Subtract Square solver is optional
+    numpy = None
+
+# results of a position for the player whose turn it is
+WIN = 1
+LOSS = -1
+DRAW = 0
+# environment variable naming a .npy file to keep the NumPy Subtract Square
+# table in between processes; without it the table is only kept in memory
+SUBSQUARE_PATH_VAR = "SUBSQUARE_PATH"
+# number of values the NumPy solver works out at a time
+SUBSQUARE_BLOCK = 1 << 16
+
+
+def all_chop_states() -> List[ChopState]:
+    """
+    Returns every ChopState, each hand holding 0 to 4 fingers with either
+    player to move.
+
+    >>> len(all_chop_states())
+    1250
+    """
+    states = []
+    for code in range(CHOP_CODES):
+        state = ChopState(True)
+        state.code = code
+        states.append(state)
+    return states
+
+
+def solve_chopsticks() -> Dict[ChopState, Tuple[int, Optional[int]]]:
+    """
+    Returns the result of every ChopState for the player to move, along with
+    the number of moves left until the game ends if both players play well,
+    or None for a draw.
+
+    Positions repeat in Chopsticks, so instead of searching forward from a
+    position, results are worked out backward from the finished positions.
+    A position is won if some move reaches a position lost for the opponent,
+    and lost once every move reaches a position won for the opponent. The
+    positions never labelled this way are draws, since neither player can
+    force the game to end.
+
+    >>> solution = solve_chopsticks()
+    >>> solution[ChopState(True)]
+    (0, None)
+    >>> cS = ChopState(True)
+    >>> cS.p1_left, cS.p2_left, cS.p2_right = 0, 0, 4
+    >>> solution[cS]
+    (1, 1)
+    """
+    chop = Chopsticks(True)
+    solution = {}
+    parents = {}
+    # number of moves from each position not yet known to lose
+    unresolved = {}
+    finished = []
+    for state in all_chop_states():
+        parents.setdefault(state, [])
+        if chop.is_over(state):
+            # the player to move in a finished game has lost
+            solution[state] = (LOSS, 0)
+            finished.append(state)
+            continue
+        moves = state.get_possible_moves()
+        unresolved[state] = len(moves)
+        for move in moves:
+            parents.setdefault(state.make_move(move), []).append(state)
+    # labelling positions in order of distance from the end of the game, so
+    # that each is labelled with its shortest win or longest loss
+    i = 0
+    while i < len(finished):
+        state = finished[i]
+        result, distance = solution[state]
+        for parent in parents[state]:
+            if parent in solution:
+                continue
+            if result == LOSS:
+                solution[parent] = (WIN, distance + 1)
+                finished.append(parent)
+            else:
+                unresolved[parent] -= 1
+                if unresolved[parent] == 0:
+                    solution[parent] = (LOSS, distance + 1)
+                    finished.append(parent)
+        i += 1
+    for state in unresolved:
+        solution.setdefault(state, (DRAW, None))
+    return solution
+
+
+# solution of Chopsticks, worked out the first time it is needed
+CHOP_SOLUTION = {}
+
+
+def get_chop_solution() -> Dict[ChopState, Tuple[int, Optional[int]]]:
+    """
+    Returns the solution of Chopsticks, solving it the first time it is
+    requested.
+
+    >>> get_chop_solution() is get_chop_solution()
+    True
+    """
+    if not CHOP_SOLUTION:
+        CHOP_SOLUTION.update(solve_chopsticks())
+    return CHOP_SOLUTION
+
+
+def chopsticks_solver_strategy(game: Game) -> Any:
+    """
+    Returns the best move for game, a game of Chopsticks, from its solution:
+    the quickest win if there is one, otherwise a draw, otherwise the slowest
+    loss.
+
+    >>> c = Chopsticks(True)
+    >>> c.current_state.p2_left = 4
+    >>> chopsticks_solver_strategy(c)
+    'll'
+    """
+    solution = get_chop_solution()
+    state = game.current_state
+
+    def rank(move: str) -> Tuple[int, int]:
+        """
+        Returns how good move is for the player to move, higher being better.
+        """
+        result, distance = solution[state.make_move(move)]
+        if result == LOSS:
+            return 2, -distance
+        elif result == DRAW:
+            return 1, 0
+        return 0, distance
+
+    return max(state.get_possible_moves(), key=rank)
+
+
+class SubSquareTable:
+    """
+    Table of which Subtract Square values are won for the player to move,
+    worked out bottom-up and grown on demand.
+
+    ===Attributes===
+    wins: a byte per value from 0 up, 1 if the player to move wins from that
+          value and 0 if they lose
+    losses: values from which the player to move loses, in increasing order
+    """
+    wins: bytearray
+    losses: List[int]
+    _squares: List[int]
+
+    def __init__(self, size: int = 1024) -> None:
+        """
+        Initializes a table of the values from 0 to size - 1.
+
+        >>> t = SubSquareTable(11)
+        >>> t.losses
+        [0, 2, 5, 7, 10]
+        """
+        self.wins = bytearray()
+        self.losses = []
+        self._squares = []
+        self.grow(size - 1)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of values in the table.
+
+        >>> len(SubSquareTable(20))
+        20
+        """
+        return len(self.wins)
+
+    def grow(self, value: int) -> None:
+        """
+        Extends the table to include value, at least doubling its size so that
+        growing one value at a time takes linear time overall.
+
+        Every value a square above a lost value is won, since subtracting
+        that square leaves the opponent the lost value. Values are visited in
+        increasing order, so a value never marked won by then is lost.
+
+        >>> t = SubSquareTable(11)
+        >>> t.grow(20)
+        >>> t.losses
+        [0, 2, 5, 7, 10, 12, 15, 17, 20]
+        """
+        old = len(self.wins)
+        if value < old:
+            return
+        size = max(value + 1, 2 * old)
+        self.wins.extend(bytes(size - old))
+        self._squares = [k * k for k in range(1, math.isqrt(size - 1) + 1)]
+        # values won through squares which did not fit in the smaller table
+        for loss in self.losses:
+            for k in range(math.isqrt(old - 1 - loss) + 1,
+                           math.isqrt(size - 1 - loss) + 1):
+                self.wins[loss + k * k] = 1
+        value = self.wins.find(0, old)
+        while value != -1:
+            self.losses.append(value)
+            for square in islice(self._squares,
+                                 math.isqrt(size - 1 - value)):
+                self.wins[value + square] = 1
+            value = self.wins.find(0, value + 1)
+
+    def is_win(self, value: int) -> bool:
+        """
+        Returns whether the player to move wins from value, growing the table
+        if value is not in it.
+
+        >>> t = SubSquareTable(4)
+        >>> t.is_win(4), t.is_win(5)
+        (True, False)
+        """
+        self.grow(value)
+        return bool(self.wins[value])
+
+    def winning_move(self, value: int) -> Optional[int]:
+        """
+        Returns the smallest square which leaves the opponent a lost value, or
+        None if the player to move loses from value. Takes O(sqrt(value))
+        time once value is in the table.
+
+        >>> t = SubSquareTable()
+        >>> t.winning_move(8), t.winning_move(10)
+        (1, None)
+        """
+        self.grow(value)
+        for square in islice(self._squares, math.isqrt(value)):
+            if not self.wins[value - square]:
+                return square
+        return None
+
+
+def _isqrt_array(values: 'numpy.ndarray') -> 'numpy.ndarray':
+    """
+    Returns the integer square root of each of values.
+
+    ~No Docstests provided as they rely on NumPy~
+    """
+    roots = numpy.sqrt(values.astype(numpy.float64)).astype(numpy.int64)
+    # correcting roots which floating point rounded to the next integer
+    roots -= roots * roots > values
+    roots += (roots + 1) * (roots + 1) <= values
+    return roots
+
+
+def solve_subsquare_array(size: int, path: str = None) -> 'numpy.ndarray':
+    """
+    Returns an array of a byte per Subtract Square value from 0 to size - 1,
+    1 if the player to move wins from that value. If path is given, the
+    array is saved to the .npy file at path and memory-mapped from it.
+
+    Values are worked out a block at a time. A value is won if some lost
+    value is a square below it. For each earlier lost value, the squares
+    landing in the block are found with vectorized square roots, and every
+    value they reach is marked won at once. The values left in the block are
+    then visited in order, each unmarked one being lost and marking the
+    values a square above it within the block.
+
+    Requires NumPy.
+    """
+    squares = numpy.arange(1, math.isqrt(max(size - 1, 1)) + 1,
+                           dtype=numpy.int64) ** 2
+    losses = numpy.zeros(0, numpy.int64)
+    if path is None:
+        wins = numpy.zeros(size, numpy.uint8)
+    else:
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        wins = numpy.lib.format.open_memmap(temp, mode="w+",
+                                            dtype=numpy.uint8, shape=(size,))
+    for start in range(0, size, SUBSQUARE_BLOCK):
+        end = min(start + SUBSQUARE_BLOCK, size)
+        block = bytearray(end - start)
+        view = numpy.frombuffer(block, numpy.uint8)
+        if len(losses):
+            # roots of the squares taking each earlier lost value into block
+            first = _isqrt_array(start - 1 - losses) + 1
+            counts = numpy.maximum(
+                _isqrt_array(end - 1 - losses) - first + 1, 0)
+            total = int(counts.sum())
+            if total:
+                starts = numpy.cumsum(counts) - counts
+                roots = numpy.arange(total, dtype=numpy.int64) + \
+                    numpy.repeat(first - starts, counts)
+                view[numpy.repeat(losses - start, counts) + roots * roots] = 1
+        found = []
+        value = block.find(0)
+        while value != -1:
+            found.append(start + value)
+            view[value + squares[:math.isqrt(end - start - 1 - value)]] = 1
+            value = block.find(0, value + 1)
+        wins[start:end] = view
+        losses = numpy.concatenate([losses, numpy.array(found, numpy.int64)])
+    if path is None:
+        return wins
+    wins.flush()
+    del wins
+    os.replace(temp, path)
+    return numpy.load(path, mmap_mode="r")
+
+
+class NumpySubSquareTable:
+    """
+    Table of which Subtract Square values are won for the player to move,
+    worked out with NumPy. Given a .npy file, the table is memory-mapped from
+    it, so that later processes load it without working it out again. Has
+    the same methods as SubSquareTable.
+
+    ===Attributes===
+    path: .npy file holding the table, or None if it is only kept in memory
+    wins: a byte per value from 0 up, 1 if the player to move wins from that
+          value and 0 if they lose
+    """
+    path: Optional[str]
+    wins: 'numpy.ndarray'
+
+    def __init__(self, path: str = None) -> None:
+        """
+        Initializes a table from the file at path, or an empty table if there
+        is no path or no such file yet.
+        """
+        self.path = path
+        if path is not None and os.path.exists(path):
+            self.wins = numpy.load(path, mmap_mode="r")
+        else:
+            self.wins = numpy.zeros(0, numpy.uint8)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of values in the table.
+        """
+        return len(self.wins)
+
+    def grow(self, value: int) -> None:
+        """
+        Extends the table to include value, at least doubling its size, and
+        saves it to path if there is one.
+        """
+        if value >= len(self.wins):
+            self.wins = solve_subsquare_array(
+                max(value + 1, 2 * len(self.wins), 1024), self.path)
+
+    def is_win(self, value: int) -> bool:
+        """
+        Returns whether the player to move wins from value, growing the table
+        if value is not in it.
+        """
+        self.grow(value)
+        return bool(self.wins[value])
+
+    def winning_move(self, value: int) -> Optional[int]:
+        """
+        Returns the smallest square which leaves the opponent a lost value, or
+        None if the player to move loses from value.
+        """
+        self.grow(value)
+        squares = numpy.arange(1, math.isqrt(value) + 1,
+                               dtype=numpy.int64) ** 2
+        lost = numpy.flatnonzero(self.wins[value - squares] == 0)
+        return int(squares[lost[0]]) if len(lost) else None
+
+
+# win/loss tables of Subtract Square built so far, keyed by the file they are
+# kept in, and grown as larger values are played
+SUBSQUARE_TABLES: Dict[Optional[str], Any] = {}
+
+
+def get_subsquare_table() -> Union[SubSquareTable, 'NumpySubSquareTable']:
+    """
+    Returns the win/loss table of Subtract Square, building it the first time
+    it is requested: with NumPy, kept in the file named by the environment
+    variable SUBSQUARE_PATH_VAR if it is set, and in pure Python otherwise.
+    No file is written unless the environment variable is set.
+
+    >>> get_subsquare_table() is get_subsquare_table()
+    True
+    """
+    path = os.environ.get(SUBSQUARE_PATH_VAR) if numpy is not None else None
+    if path not in SUBSQUARE_TABLES:
+        SUBSQUARE_TABLES[path] = SubSquareTable() if numpy is None else \
+            NumpySubSquareTable(path)
+    return SUBSQUARE_TABLES[path]
+
+
+def subsquare_solver_strategy(game: Game) -> Any:
+    """
+    Returns a winning square for game, a game of Subtract Square, from
+    get_subsquare_table(), or 1 if every square loses.
+
+    ~No Docstests provided as they rely on input~
+    """
+    value = game.current_state.current_val
+    move = get_subsquare_table().winning_move(value)
+    return 1 if move is None else move
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,38 @@
+"""
+Plays many games between pairs of strategies without any input or output,
+to compare how often and how quickly they win. The games are played by the
+game-agnostic tournament_runner module.
+
+Run this module directly to play a tournament, for example:
+
+    python tournament.py c --games 10000 --pair r:r --pair cs:r
+    python tournament.py s --start 100 --games 1000 --pair ss:r
+"""
+import os
+from games import SubSquare, Chopsticks
+from strategy import random_strategy
+from solvers import chopsticks_solver_strategy, subsquare_solver_strategy
+from tournament_runner import tournament_parser, run_from_args
+
+# games that can be played in a tournament, and the strategies that can play
+# them, named as in game_interface; interactive_strategy is left out since it
+# asks for input
+tournament_games = {'s': SubSquare,
+                    'c': Chopsticks}
+tournament_strategies = {'r': random_strategy,
+                         'cs': chopsticks_solver_strategy,
+                         'ss': subsquare_solver_strategy}
+
+# moves after which a game is stopped as a draw, since Chopsticks positions
+# can repeat forever
+MAX_MOVES = 200
+
+
+if __name__ == '__main__':
+    parser = tournament_parser(tournament_games, tournament_strategies,
+                               os.cpu_count() or 1, MAX_MOVES)
+    parser.add_argument("--start", type=int, default=100,
+                        help="starting value of Subtract Square")
+    args = parser.parse_args()
+    run_from_args(parser, args, tournament_games, tournament_strategies,
+                  {'start_value': args.start} if args.game == 's' else {})
@@ -0,0 +1,305 @@
+"""
+A game-agnostic runner playing many games between pairs of strategies without
+any input or output, to compare how often and how quickly they win. The games
+and strategies to choose from are passed in by the tournament module, and A2
+keeps an identical runner of its own so that each assignment runs alone.
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Strategy = Callable[[Any], Any]
+
+
+class MatchResult:
+    """
+    Results of games played between the strategies of player 1 and player 2.
+
+    ===Attributes===
+    games: number of games played
+    wins: number of games won by each player, keyed 'p1' and 'p2'; games won
+    by neither are draws
+    moves: number of moves made by each player
+    thinking: seconds each player's strategy spent choosing its moves
+    elapsed: wall-clock seconds taken to play the games
+    """
+    games: int
+    wins: Dict[str, int]
+    moves: Dict[str, int]
+    thinking: Dict[str, float]
+    elapsed: float
+
+    def __init__(self) -> None:
+        """
+        Initializes a MatchResult of no games.
+
+        >>> r = MatchResult()
+        >>> r.games, r.wins, r.draws()
+        (0, {'p1': 0, 'p2': 0}, 0)
+        """
+        self.games = 0
+        self.wins = {'p1': 0, 'p2': 0}
+        self.moves = {'p1': 0, 'p2': 0}
+        self.thinking = {'p1': 0.0, 'p2': 0.0}
+        self.elapsed = 0.0
+
+    def __repr__(self) -> str:
+        """
+        Returns a representation of self.
+
+        >>> MatchResult()
+        MatchResult(games=0, p1_wins=0, p2_wins=0, draws=0, elapsed=0.000000)
+        """
+        return "MatchResult(games={}, p1_wins={}, p2_wins={}, draws={}, " \
+               "elapsed={:.6f})".format(self.games, self.wins['p1'],
+                                        self.wins['p2'], self.draws(),
+                                        self.elapsed)
+
+    def draws(self) -> int:
+        """
+        Returns the number of games won by neither player.
+        """
+        return self.games - self.wins['p1'] - self.wins['p2']
+
+    def merge(self, other: 'MatchResult') -> None:
+        """
+        Adds the games of other, played at the same time as those of self,
+        to self.
+
+        >>> r, s = MatchResult(), MatchResult()
+        >>> r.games, r.wins['p1'], r.elapsed = 3, 2, 1.5
+        >>> s.games, s.wins['p2'], s.elapsed = 2, 1, 2.0
+        >>> r.merge(s)
+        >>> r
+        MatchResult(games=5, p1_wins=2, p2_wins=1, draws=2, elapsed=2.000000)
+        """
+        self.games += other.games
+        for player in ['p1', 'p2']:
+            self.wins[player] += other.wins[player]
+            self.moves[player] += other.moves[player]
+            self.thinking[player] += other.thinking[player]
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+    def win_rate(self, player: str) -> float:
+        """
+        Returns the fraction of games won by player.
+
+        Precondition: player is 'p1' or 'p2'.
+        """
+        return self.wins[player] / self.games if self.games else 0.0
+
+    def move_latency(self, player: str) -> float:
+        """
+        Returns the average seconds player's strategy took to choose a move.
+
+        Precondition: player is 'p1' or 'p2'.
+        """
+        return self.thinking[player] / self.moves[player] \
+            if self.moves[player] else 0.0
+
+    def games_per_second(self) -> float:
+        """
+        Returns the number of games played per wall-clock second.
+        """
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+
+def play_game(game_type: Callable[..., Any], params: Dict[str, Any],
+              p1_strategy: Strategy, p2_strategy: Strategy, p1_starts: bool,
+              max_moves: int = None, result: MatchResult = None)\
+        -> Optional[str]:
+    """
+    Plays one game of game_type, created with p1_starts and the keyword
+    arguments params, between p1_strategy and p2_strategy without any input
+    or output, and returns the name of the winner, or None if the game is
+    stopped after max_moves moves or won by neither player. The moves made
+    and the time taken to choose them are added to result if given.
+
+    >>> from games import SubSquare, Chopsticks
+    >>> from strategy import random_strategy
+    >>> from solvers import subsquare_solver_strategy
+    >>> play_game(SubSquare, {'start_value': 11}, subsquare_solver_strategy,
+    ...           subsquare_solver_strategy, True)
+    'p1'
+    >>> play_game(Chopsticks, {}, random_strategy, random_strategy, True,
+    ...           0) is None
+    True
+    """
+    game = game_type(p1_starts, **params)
+    strategies = {'p1': p1_strategy, 'p2': p2_strategy}
+    made = 0
+    while not game.is_over(game.current_state):
+        if max_moves is not None and made >= max_moves:
+            return None
+        player = game.current_state.get_current_player_name()
+        start = time.perf_counter()
+        move = strategies[player](game)
+        elapsed = time.perf_counter() - start
+        if not game.current_state.is_valid_move(move):
+            raise ValueError("{} chose the invalid move {!r}".format(
+                strategies[player].__name__, move))
+        game.current_state = game.current_state.make_move(move)
+        made += 1
+        if result is not None:
+            result.moves[player] += 1
+            result.thinking[player] += elapsed
+    for player in ['p1', 'p2']:
+        if game.is_winner(player):
+            return player
+    return None
+
+
+def _match_job(game_type: Callable[..., Any], params: Dict[str, Any],
+               p1_strategy: Strategy, p2_strategy: Strategy,
+               games: range, p1_starts: Optional[bool], max_moves: int,
+               seed: Optional[int]) -> MatchResult:
+    """
+    Returns the results of playing the games numbered in games, as described
+    in play_match. Run in a worker process by play_match.
+    """
+    if seed is not None:
+        random.seed(seed + games.start)
+    result = MatchResult()
+    start = time.perf_counter()
+    for number in games:
+        first = number % 2 == 0 if p1_starts is None else p1_starts
+        winner = play_game(game_type, params, p1_strategy, p2_strategy, first,
+                           max_moves, result)
+        result.games += 1
+        if winner is not None:
+            result.wins[winner] += 1
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def play_match(game_type: Callable[..., Any], params: Dict[str, Any],
+               p1_strategy: Strategy, p2_strategy: Strategy, games: int,
+               workers: int = 1, p1_starts: bool = None,
+               max_moves: int = None, seed: int = None) -> MatchResult:
+    """
+    Returns the results of playing games games of game_type, created with the
+    keyword arguments params, between p1_strategy and p2_strategy. Player 1
+    makes the first move in every game if p1_starts, player 2 if p1_starts is
+    False, and the players take turns making it otherwise. Games are stopped
+    as draws after max_moves moves.
+
+    With more than one worker, the games are split evenly over a pool of
+    that many worker processes, so the strategies must be module-level
+    functions. With seed, each batch of games seeds random from it, so that
+    a match can be replayed.
+
+    >>> from games import SubSquare
+    >>> from strategy import random_strategy
+    >>> from solvers import subsquare_solver_strategy
+    >>> r = play_match(SubSquare, {'start_value': 11},
+    ...                subsquare_solver_strategy, random_strategy, 4,
+    ...                p1_starts=True)
+    >>> r.games, r.wins
+    (4, {'p1': 4, 'p2': 0})
+    """
+    workers = max(1, min(workers, games))
+    batches = [range(games * i // workers, games * (i + 1) // workers)
+               for i in range(workers)]
+    start = time.perf_counter()
+    if workers == 1:
+        result = _match_job(game_type, params, p1_strategy, p2_strategy,
+                            batches[0], p1_starts, max_moves, seed)
+    else:
+        result = MatchResult()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = [executor.submit(_match_job, game_type, params,
+                                    p1_strategy, p2_strategy, batch,
+                                    p1_starts, max_moves, seed)
+                    for batch in batches]
+            for job in jobs:
+                result.merge(job.result())
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run_tournament(game_type: Callable[..., Any], params: Dict[str, Any],
+                   strategies: Dict[str, Strategy],
+                   pairs: List[Tuple[str, str]], games: int,
+                   workers: int = 1, p1_starts: bool = None,
+                   max_moves: int = None, seed: int = None)\
+        -> List[Tuple[str, str, MatchResult]]:
+    """
+    Plays a match of games games, as play_match does, between each pair of
+    strategies in pairs, named as in strategies with player 1's strategy
+    first, and returns the pairs along with their results.
+
+    >>> from games import Chopsticks
+    >>> from strategy import random_strategy
+    >>> s = {'r': random_strategy}
+    >>> [r[2].games for r in run_tournament(Chopsticks, {}, s, [('r', 'r')],
+    ...                                     2, max_moves=10)]
+    [2]
+    """
+    return [(p1, p2, play_match(game_type, params, strategies[p1],
+                                strategies[p2], games, workers, p1_starts,
+                                max_moves, seed))
+            for p1, p2 in pairs]
+
+
+def print_tournament(results: List[Tuple[str, str, MatchResult]]) -> None:
+    """
+    Prints the win rate and average milliseconds per move of each strategy,
+    and the games played per second, of every match in results.
+    """
+    print("{:<6}{:<6}{:>8}{:>8}{:>8}{:>8}{:>10}{:>10}{:>10}".format(
+        "p1", "p2", "games", "p1 win", "p2 win", "draw", "p1 ms", "p2 ms",
+        "games/s"))
+    for p1, p2, result in results:
+        print("{:<6}{:<6}{:>8}{:>8.1%}{:>8.1%}{:>8.1%}{:>10.3f}{:>10.3f}"
+              "{:>10.1f}".format(
+                  p1, p2, result.games, result.win_rate('p1'),
+                  result.win_rate('p2'),
+                  result.draws() / result.games if result.games else 0.0,
+                  1000 * result.move_latency('p1'),
+                  1000 * result.move_latency('p2'),
+                  result.games_per_second()))
+
+
+def tournament_parser(games: Dict[str, Callable[..., Any]],
+                      strategies: Dict[str, Strategy], workers: int,
+                      max_moves: int = None) -> argparse.ArgumentParser:
+    """
+    Returns a parser of the options of a tournament between strategies on one
+    of games, to which game-specific options can be added.
+
+    >>> p = tournament_parser({'h': None}, {'ro': None}, 1)
+    >>> a = p.parse_args(["h", "--pair", "ro:ro"])
+    >>> a.game, a.pair, a.games, a.max_moves
+    ('h', ['ro:ro'], 100, None)
+    """
+    parser = argparse.ArgumentParser(
+        description="Play games between pairs of strategies.")
+    parser.add_argument("game", choices=sorted(games))
+    parser.add_argument("--pair", action="append", required=True,
+                        help="strategies of player 1 and player 2 as p1:p2, "
+                             "from {}".format(", ".join(sorted(strategies))))
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=workers)
+    parser.add_argument("--max-moves", type=int, default=max_moves)
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def run_from_args(parser: argparse.ArgumentParser, args: argparse.Namespace,
+                  games: Dict[str, Callable[..., Any]],
+                  strategies: Dict[str, Strategy],
+                  params: Dict[str, Any]) -> None:
+    """
+    Plays and prints the tournament described by args, parsed by parser from
+    the options of tournament_parser, creating games with the keyword
+    arguments params.
+    """
+    pairs = [tuple(pair.split(":")) for pair in args.pair]
+    for pair in pairs:
+        if len(pair) != 2 or not all([s in strategies for s in pair]):
+            parser.error("unknown strategy pair {}".format(":".join(pair)))
+    print_tournament(run_tournament(
+        games[args.game], params, strategies, pairs, args.games,
+        args.workers, None, args.max_moves, args.seed))
@@ -1,8 +1,9 @@
 """
-Bare bones Tree ADT for iterative minimax.
+Bare bones Tree ADT and search frame for iterative minimax, and search tree
+node for Monte Carlo tree search.
 """
 
-from typing import List, Union
+from typing import Iterator, List, Union
 
 
 class MinimaxTree:
@@ -33,6 +34,100 @@ class MinimaxTree:
         self.children = children.copy() if children else []
 
 
+class MinimaxFrame:
+    """
+    Frame of a depth-first iterative minimax search. Only the frames on the
+    path from the root to the state being searched are kept, each scored
+    child is dropped as soon as its score is backed up into its parent.
+
+    ===Attributes===
+    value: game state searched by this frame
+    moves: moves of value which have not been searched yet
+    move: move made to reach value from the parent's state
+    score: best score found so far for the player to move in value
+    best_move: move achieving score
+    parent: frame of the parent state, None for the root
+    """
+    value: object
+    moves: Iterator[Union[str, int]]
+    move: Union[str, int]
+    score: int
+    best_move: Union[str, int]
+    parent: 'MinimaxFrame'
+
+    def __init__(self, value: object, move: object = None,
+                 parent: 'MinimaxFrame' = None) -> None:
+        """
+        Create a frame searching the possible moves of state value, reached
+        through move from parent.
+
+        >>> f = MinimaxFrame(None)
+        >>> f.score is None and f.parent is None
+        True
+        """
+        self.value = value
+        self.moves = iter(value.get_possible_moves() if value is not None
+                          else [])
+        self.move = move
+        self.score = None
+        self.best_move = None
+        self.parent = parent
+
+    def back_up(self, score: int, move: object) -> None:
+        """
+        Record score for the player to move in this frame's state, found
+        through move. Of equal scores, the greatest move is kept.
+
+        >>> f = MinimaxFrame(None)
+        >>> f.back_up(0, "A")
+        >>> f.back_up(0, "C")
+        >>> f.back_up(-1, "D")
+        >>> f.score, f.best_move
+        (0, 'C')
+        """
+        if self.score is None or (score, move) > (self.score, self.best_move):
+            self.score, self.best_move = score, move
+
+
+class MCTSNode:
+    """
+    Node of a Monte Carlo search tree, identified with the subtree below it.
+
+    ===Attributes===
+    value: game state of this node
+    move: move made to reach value from the parent's state
+    parent: node of the parent state, None for the root
+    children: nodes of the moves of value which have been expanded
+    untried: moves of value which have not been expanded yet
+    visits: number of playouts through this node
+    wins: total outcome of those playouts for the player who made move
+    """
+    value: object
+    move: Union[str, int]
+    parent: 'MCTSNode'
+    children: List['MCTSNode']
+    untried: List[Union[str, int]]
+    visits: int
+    wins: float
+
+    def __init__(self, value: object, move: object = None,
+                 parent: 'MCTSNode' = None) -> None:
+        """
+        Create a node for state value, reached through move from parent.
+
+        >>> n = MCTSNode(None)
+        >>> n.visits, n.wins, n.children, n.untried
+        (0, 0.0, [], [])
+        """
+        self.value = value
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = value.get_possible_moves() if value is not None else []
+        self.visits = 0
+        self.wins = 0.0
+
+
 if __name__ == "__main__":
     from python_ta import check_all
     check_all(config="a2_pyta.txt")
@@ -0,0 +1,456 @@
+"""
+Benchmarks for comparing the speed of strategies and game states.
+
+Run this module directly to print every benchmark.
+"""
+import gc
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple, Union
+from game import Game
+from game_state import GameState
+from stonehenge import StonehengeGame, StonehengeTopology, _board_layout
+from stonehenge_bitboard import StonehengeBitState
+from strategy import recursive_minimax_strategy, iterative_minimax_strategy, \
+    alphabeta_minimax_strategy, parallel_minimax_strategy, \
+    lean_minimax_strategy, mcts_strategy, parallel_mcts_strategy, \
+    rough_outcome_strategy, inplace_minimax_strategy, \
+    inplace_alphabeta_strategy, iterative_deepening_strategy, \
+    SEARCH_REPORTS, PARALLEL_WORKERS, _get_pool
+from tournament_runner import MatchResult, play_game
+
+
+def count_states(game: Game, game_state: GameState) -> int:
+    """
+    Return the number of states in the game tree rooted at game_state, which
+    is the number of states full minimax visits.
+
+    >>> g = StonehengeGame(True, 1)
+    >>> count_states(g, g.current_state)
+    4
+    """
+    if game.is_over(game_state):
+        return 1
+    return 1 + sum([count_states(game, game_state.make_move(move))
+                    for move in game_state.get_possible_moves()])
+
+
+def time_strategy(strategy: Callable[[Game], Union[str, int]],
+                  game: Game) -> float:
+    """
+    Return the number of seconds strategy takes to choose a move for game.
+    """
+    start = time.perf_counter()
+    strategy(game)
+    return time.perf_counter() - start
+
+
+def stonehenge_game(size: int, moves: List[str]) -> StonehengeGame:
+    """
+    Return a game of Stonehenge of the given size in which the cells labelled
+    moves have been claimed, starting with player 1.
+
+    >>> stonehenge_game(2, ["A", "D"]).current_state.get_possible_moves()
+    [1, 2, 4, 5, 6]
+    """
+    game = StonehengeGame(True, size)
+    for move in moves:
+        game.current_state = game.current_state.make_move(
+            game.str_to_move(move))
+    return game
+
+
+def benchmark_alphabeta(size: int = 3, moves: List[str] = None) -> None:
+    """
+    Print the time and number of states visited by the minimax strategies and
+    alpha-beta pruning on a Stonehenge board of the given size after moves.
+    """
+    moves = ["D", "H", "G"] if moves is None else moves
+    game = stonehenge_game(size, moves)
+    nodes = count_states(game, game.current_state)
+    print("Minimax on size {} Stonehenge after moves {}".format(
+        size, ", ".join(moves)))
+    print("{:<12}{:>12}{:>12}".format("strategy", "nodes", "seconds"))
+    for name, strategy in [("recursive", recursive_minimax_strategy),
+                           ("iterative", iterative_minimax_strategy)]:
+        print("{:<12}{:>12}{:>12.3f}".format(name, nodes,
+                                             time_strategy(strategy, game)))
+    for ordering in ["ley", "rough", "none"]:
+        elapsed = time_strategy(
+            lambda g: alphabeta_minimax_strategy(g, ordering), game)
+        print("{:<12}{:>12}{:>12.3f}".format(
+            "ab-" + ordering, SEARCH_REPORTS["alphabeta"].nodes, elapsed))
+
+
+def benchmark_parallel(size: int = 3, moves: List[str] = None,
+                       workers: List[int] = None) -> None:
+    """
+    Print the time taken and speedup over recursive minimax of parallel
+    minimax with each number of workers, on a Stonehenge board of the given
+    size after moves. Each pool is started before it is timed, as it is by
+    the first move of a game.
+    """
+    moves = ["D", "H", "G"] if moves is None else moves
+    workers = [1, 2, 4, 8, 16, 32] if workers is None else workers
+    game = stonehenge_game(size, moves)
+    serial = time_strategy(recursive_minimax_strategy, game)
+    print("Parallel minimax on size {} Stonehenge after moves {} "
+          "({} cores)".format(size, ", ".join(moves), PARALLEL_WORKERS))
+    print("{:<12}{:>12}{:>12}".format("workers", "seconds", "speedup"))
+    print("{:<12}{:>12.3f}{:>12.2f}".format("serial", serial, 1))
+    for count in workers:
+        _get_pool(count, False).submit(int).result()
+        elapsed = time_strategy(
+            lambda g: parallel_minimax_strategy(g, count), game)
+        print("{:<12}{:>12.3f}{:>12.2f}".format(count, elapsed,
+                                                serial / elapsed))
+
+
+def peak_memory(strategy: Callable[[Game], Union[str, int]],
+                game: Game) -> int:
+    """
+    Return the peak number of bytes allocated while strategy chooses a move
+    for game.
+    """
+    tracemalloc.start()
+    strategy(game)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def benchmark_lean(size: int = 3, moves: List[str] = None) -> None:
+    """
+    Print the peak memory and number of search nodes alive at once for
+    iterative minimax and lean minimax on a Stonehenge board of the given size
+    after moves.
+    """
+    moves = ["D", "H", "G", "C"] if moves is None else moves
+    game = stonehenge_game(size, moves)
+    print("Peak memory on size {} Stonehenge after moves {}".format(
+        size, ", ".join(moves)))
+    print("{:<12}{:>12}{:>12}".format("strategy", "peak nodes", "peak KiB"))
+    print("{:<12}{:>12}{:>12.0f}".format(
+        "iterative", count_states(game, game.current_state),
+        peak_memory(iterative_minimax_strategy, game) / 1024))
+    peak = peak_memory(lean_minimax_strategy, game)
+    print("{:<12}{:>12}{:>12.0f}".format(
+        "lean", SEARCH_REPORTS["lean"].peak_nodes, peak / 1024))
+
+
+def collections_and_time(strategy: Callable[[Game], Union[str, int]],
+                         game: Game) -> Tuple[int, float]:
+    """
+    Return the number of youngest-generation garbage collections run and the
+    seconds taken while strategy chooses a move for game.
+    """
+    gc.collect()
+    before = gc.get_stats()[0]["collections"]
+    elapsed = time_strategy(strategy, game)
+    return gc.get_stats()[0]["collections"] - before, elapsed
+
+
+def benchmark_inplace(size: int = 3, moves: List[str] = None) -> None:
+    """
+    Print the time, garbage collections and peak memory of searches creating
+    a state for every node and of the same searches applying and undoing
+    moves on one state: alpha-beta solving a whole Stonehenge board of the
+    given size, and full minimax after moves.
+    """
+    moves = ["D", "H", "G"] if moves is None else moves
+    print("Copying and in-place searches on size {} Stonehenge".format(size))
+    print("{:<14}{:>8}{:>12}{:>12}{:>12}".format(
+        "strategy", "moves", "seconds", "gen0 GCs", "peak KiB"))
+    for name, played, strategy in [
+            ("ab-ley", [], alphabeta_minimax_strategy),
+            ("abu-ley", [], inplace_alphabeta_strategy),
+            ("ab-none", [], lambda g: alphabeta_minimax_strategy(g, "none")),
+            ("abu-none", [], lambda g: inplace_alphabeta_strategy(g, "none")),
+            ("recursive", moves, recursive_minimax_strategy),
+            ("inplace", moves, inplace_minimax_strategy)]:
+        game = stonehenge_game(size, played)
+        collections, elapsed = collections_and_time(strategy, game)
+        print("{:<14}{:>8}{:>12.3f}{:>12}{:>12.0f}".format(
+            name, len(played), elapsed, collections,
+            peak_memory(strategy, game) / 1024))
+
+
+def retained_bytes(game_state: GameState) -> float:
+    """
+    Return the average number of bytes held by each state of the game tree
+    rooted at game_state, when every state of the tree is kept alive at once
+    as in a MinimaxTree.
+    """
+    states = []
+    pending = [game_state]
+    tracemalloc.start()
+    while pending:
+        state = pending.pop()
+        states.append(state)
+        if not state.is_over():
+            pending.extend([state.make_move(move)
+                            for move in state.get_possible_moves()])
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used / len(states)
+
+
+def benchmark_retained(size: int = 3, moves: List[str] = None) -> None:
+    """
+    Print the bytes held per state when every state of the game tree of a
+    Stonehenge board of the given size after moves is kept alive, for list
+    states sharing unchanged rows and ley-lines and for bitboard states.
+    """
+    moves = ["D", "H", "G", "C"] if moves is None else moves
+    state = stonehenge_game(size, moves).current_state
+    print("Bytes per retained state on size {} Stonehenge after moves "
+          "{}".format(size, ", ".join(moves)))
+    print("{:<12}{:>12}".format("state", "bytes"))
+    print("{:<12}{:>12.0f}".format("list", retained_bytes(state)))
+    print("{:<12}{:>12.0f}".format(
+        "bitboard", retained_bytes(StonehengeBitState.from_state(state))))
+
+
+def time_call(function: Callable[[], object], calls: int) -> float:
+    """
+    Return the average number of microseconds function takes over calls calls.
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def benchmark_queries(sizes: List[int] = None, calls: int = 200) -> None:
+    """
+    Print the average cost of the queries made on every node of a search, on
+    a Stonehenge state of each size after two moves.
+    """
+    sizes = [2, 3, 4, 5] if sizes is None else sizes
+    print("Microseconds per call on Stonehenge after moves A, C")
+    print("{:<6}{:>10}{:>10}{:>10}{:>10}".format(
+        "size", "is_over", "moves", "make", "rough"))
+    for size in sizes:
+        game = stonehenge_game(size, ["A", "C"])
+        state = game.current_state
+        print("{:<6}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.0f}".format(
+            size, time_call(lambda: game.is_over(state), calls),
+            time_call(state.get_possible_moves, calls),
+            time_call(lambda: state.make_move(1), calls),
+            time_call(state.rough_outcome, max(calls // 100, 1))))
+
+
+def benchmark_scaling(sizes: List[int] = None, calls: int = 200,
+                      budget: float = 1.0) -> None:
+    """
+    Print how the cost of building a board's topology, of the queries made on
+    every node of a search, and of searching grow with the size of the board,
+    on an empty Stonehenge board of each size. Searches are given budget
+    seconds: MCTS reports its playouts per second and iterative deepening the
+    depth it completes.
+    """
+    sizes = [6, 7, 8, 9, 10] if sizes is None else sizes
+    print("Stonehenge scaling, {} seconds per search".format(budget))
+    print("{:<6}{:>6}{:>8}{:>10}{:>10}{:>10}{:>10}{:>12}{:>8}".format(
+        "size", "cells", "lines", "build ms", "moves us", "make us",
+        "apply us", "playouts/s", "depth"))
+    for size in sizes:
+        start = time.perf_counter()
+        topology = StonehengeTopology(size)
+        build = time.perf_counter() - start
+        game = stonehenge_game(size, [])
+        state = game.current_state
+        move = len(topology.cells) // 2
+        mcts_strategy(game, 10 ** 9, budget)
+        playouts = SEARCH_REPORTS["mcts"]
+        iterative_deepening_strategy(game, budget)
+        print("{:<6}{:>6}{:>8}{:>10.1f}{:>10.2f}{:>10.2f}{:>10.2f}{:>12.0f}"
+              "{:>8}".format(
+                  size, len(topology.cells), len(topology.line_cells),
+                  build * 1000, time_call(state.get_possible_moves, calls),
+                  time_call(lambda: state.make_move(move), calls),
+                  time_call(lambda: state.undo(state.apply(move)), calls),
+                  playouts.nodes / playouts.elapsed,
+                  SEARCH_REPORTS["deepening"].depth))
+
+
+def benchmark_render(sizes: List[int] = None, calls: int = 200) -> None:
+    """
+    Print the average cost of showing a Stonehenge state of each size after
+    two moves: filling in its topology's template, and laying out the board
+    from scratch as every call did before templates were cached.
+    """
+    sizes = [2, 3, 4, 5, 6, 8, 10] if sizes is None else sizes
+    print("Microseconds per string of Stonehenge after moves A, C")
+    print("{:<6}{:>10}{:>10}".format("size", "template", "layout"))
+    for size in sizes:
+        state = stonehenge_game(size, ["A", "C"]).current_state
+        width = state.topology.label_width
+        print("{:<6}{:>10.2f}{:>10.2f}".format(
+            size, time_call(lambda: str(state), calls),
+            time_call(lambda: _board_layout(
+                size, width,
+                [str(cell).center(width)
+                 for row in state.board for cell in row],
+                [str(line[0]).center(width) for line in state.ley_lines]),
+                      calls)))
+
+
+def benchmark_mcts(size: int = 4, games: int = 10,
+                   iterations: List[int] = None) -> None:
+    """
+    Print the win rate of mcts_strategy against rough_outcome_strategy and
+    milliseconds per MCTS move, for each number of iterations, on Stonehenge
+    boards of the given size. MCTS moves first in half of the games.
+    """
+    iterations = [10, 50, 200, 1000] if iterations is None else iterations
+    print("MCTS against rough outcome on size {} Stonehenge, {} games".format(
+        size, games))
+    print("{:<12}{:>12}{:>12}{:>14}".format("iterations", "win rate",
+                                            "ms/move", "wins/second"))
+    for count in iterations:
+
+        def mcts(game: Game) -> Union[str, int]:
+            """
+            Return mcts_strategy's move with count iterations.
+            """
+            return mcts_strategy(game, count)
+
+        # MCTS is player 1 in the first result, and player 2 in the second
+        results = [MatchResult(), MatchResult()]
+        wins = 0
+        for i in range(games):
+            if i % 2 == 0:
+                wins += play_game(StonehengeGame, {'size': size}, mcts,
+                                  rough_outcome_strategy, True, None,
+                                  results[0]) == "p1"
+            else:
+                wins += play_game(StonehengeGame, {'size': size},
+                                  rough_outcome_strategy, mcts, True, None,
+                                  results[1]) == "p2"
+        seconds = results[0].thinking["p1"] + results[1].thinking["p2"]
+        moves = results[0].moves["p1"] + results[1].moves["p2"]
+        print("{:<12}{:>12.2f}{:>12.1f}{:>14.2f}".format(
+            count, wins / games, seconds / moves * 1000, wins / seconds))
+
+
+def benchmark_parallel_mcts(size: int = 4, workers: List[int] = None,
+                            budget: float = 1.0, threads: bool = False) -> None:
+    """
+    Print the playouts per second of root-parallel MCTS with each number of
+    workers, given budget seconds per move, on an empty Stonehenge board of
+    the given size.
+    """
+    workers = [1, 2, 4, 8] if workers is None else workers
+    game = stonehenge_game(size, [])
+    print("Root-parallel MCTS on size {} Stonehenge, {} seconds per move, "
+          "{} ({} cores)".format(size, budget,
+                                 "threads" if threads else "processes",
+                                 PARALLEL_WORKERS))
+    print("{:<12}{:>12}{:>14}".format("workers", "playouts", "playouts/s"))
+    for count in workers:
+        parallel_mcts_strategy(game, count, 10 ** 9, budget, threads=threads)
+        report = SEARCH_REPORTS["parallel_mcts"]
+        print("{:<12}{:>12}{:>14.0f}".format(count, report.nodes,
+                                             report.nodes / report.elapsed))
+
+
+def check_zobrist(size: int) -> Dict[str, int]:
+    """
+    Return the number of positions reachable on a Stonehenge board of the
+    given size, from either player moving first, the number of them whose
+    Zobrist hash is shared with a different position, and the number whose
+    hash kept up by make_move differs from the hash computed from scratch.
+
+    >>> check_zobrist(2)["collisions"]
+    0
+    """
+    layer = {StonehengeBitState(True, size), StonehengeBitState(False, size)}
+    seen: Dict[int, tuple] = {}
+    counts = {"positions": 0, "collisions": 0, "mismatches": 0}
+    while layer:
+        for state in layer:
+            counts["positions"] += 1
+            # table_key is shared by symmetric positions, so compare the
+            # bitmasks themselves
+            key = (state.p1_turn, state.cells1, state.cells2, state.lines1,
+                   state.lines2)
+            if seen.setdefault(state.zobrist, key) != key:
+                counts["collisions"] += 1
+            if state.compute_zobrist() != state.zobrist:
+                counts["mismatches"] += 1
+        # states are hashed by their Zobrist hash, so each position is kept
+        # once however many move orders reach it
+        layer = {state.make_move(move) for state in layer
+                 for move in state.get_possible_moves()}
+    return counts
+
+
+def benchmark_zobrist(sizes: List[int] = None) -> None:
+    """
+    Print the Zobrist hash collisions among every position reachable on
+    Stonehenge boards of each size.
+    """
+    sizes = [2, 3] if sizes is None else sizes
+    print("Zobrist hashes of every reachable Stonehenge position")
+    print("{:<6}{:>12}{:>12}{:>12}{:>10}".format(
+        "size", "positions", "collisions", "mismatches", "seconds"))
+    for size in sizes:
+        start = time.perf_counter()
+        counts = check_zobrist(size)
+        print("{:<6}{:>12}{:>12}{:>12}{:>10.1f}".format(
+            size, counts["positions"], counts["collisions"],
+            counts["mismatches"], time.perf_counter() - start))
+
+
+def count_positions(size: int) -> Dict[str, int]:
+    """
+    Return the number of positions reachable on a Stonehenge board of the
+    given size, from either player moving first, and the number of them left
+    once rotations and reflections of the board are identified. These are the
+    numbers of states a search of the whole game stores in a transposition
+    table without and with symmetry.
+
+    >>> count_positions(1)
+    {'positions': 8, 'canonical': 4}
+    """
+    layer = {StonehengeBitState(True, size), StonehengeBitState(False, size)}
+    counts = {"positions": 0, "canonical": 0}
+    while layer:
+        counts["positions"] += len(layer)
+        counts["canonical"] += len({state.table_key() for state in layer})
+        layer = {state.make_move(move) for state in layer
+                 for move in state.get_possible_moves()}
+    return counts
+
+
+def benchmark_symmetry(sizes: List[int] = None) -> None:
+    """
+    Print the reduction in distinct Stonehenge positions, on boards of each
+    size, from keying positions on their canonical form under the board's
+    rotations and reflections.
+    """
+    sizes = [1, 2, 3] if sizes is None else sizes
+    print("Distinct Stonehenge positions without and with symmetry")
+    print("{:<6}{:>12}{:>12}{:>10}".format("size", "positions", "canonical",
+                                           "reduction"))
+    for size in sizes:
+        counts = count_positions(size)
+        print("{:<6}{:>12}{:>12}{:>10.2f}".format(
+            size, counts["positions"], counts["canonical"],
+            counts["positions"] / counts["canonical"]))
+
+
+if __name__ == "__main__":
+    benchmark_alphabeta()
+    benchmark_parallel()
+    benchmark_lean()
+    benchmark_inplace()
+    benchmark_retained()
+    benchmark_queries()
+    benchmark_scaling()
+    benchmark_render()
+    benchmark_zobrist()
+    benchmark_symmetry()
+    benchmark_mcts()
+    benchmark_parallel_mcts()
@@ -36,9 +36,26 @@ class Game:
         """
         raise NotImplementedError
 
+    def score(self, state: GameState, player: str) -> int:
+        """
+        Return GameState.WIN if player has won at state, GameState.LOSE if
+        player has lost and GameState.DRAW otherwise, without changing this
+        Game, so that searches can share it.
+
+        Precondition: player is 'p1' or 'p2'.
+        """
+        raise NotImplementedError
+
     def str_to_move(self, string: str) -> Any:
         """
         Return the move that string represents. If string is not a move,
         return some invalid move.
         """
         raise NotImplementedError
+
+    def move_to_str(self, move: Any) -> str:
+        """
+        Return the string showing move to players, which str_to_move reads
+        back as move.
+        """
+        return str(move)
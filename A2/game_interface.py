@@ -7,10 +7,13 @@ strategy cannot be used on Chopsticks unless you account for infinite loops.
 (You do not have to worry about this for the assignment: only do it for
 your own curiousity!)
 """
+import sys
 from strategy import *
 from typing import Any, Callable
+from instrument import Instrument
 from subtract_square_game import SubtractSquareGame
-from stonehenge import StonehengeGame
+from stonehenge import StonehengeGame, build_topologies
+from tablebase import tablebase_strategy
 
 # 'h' should map to Stonehenge.
 playable_games = {'s': SubtractSquareGame,
@@ -21,7 +24,18 @@ playable_games = {'s': SubtractSquareGame,
 usable_strategies = {'i': interactive_strategy,
                      'ro': rough_outcome_strategy,
                      'mr': recursive_minimax_strategy,
-                     'mi': iterative_minimax_strategy}
+                     'mi': iterative_minimax_strategy,
+                     'mrt': recursive_minimax_table_strategy,
+                     'mit': iterative_minimax_table_strategy,
+                     'ab': alphabeta_minimax_strategy,
+                     'id': iterative_deepening_strategy,
+                     'mp': parallel_minimax_strategy,
+                     'ml': lean_minimax_strategy,
+                     'mu': inplace_minimax_strategy,
+                     'abu': inplace_alphabeta_strategy,
+                     'tb': tablebase_strategy,
+                     'mc': mcts_strategy,
+                     'pmc': parallel_mcts_strategy}
 
 
 class GameInterface:
@@ -31,11 +45,13 @@ class GameInterface:
     """
 
     def __init__(self, game: Any, p1_strategy: Callable,
-                 p2_strategy: Callable[[Any], Any]) -> None:
+                 p2_strategy: Callable[[Any], Any],
+                 instrument: Instrument = None) -> None:
         """
         Initialize this GameInterface, setting its active game to game, and
         using the strategies p1_strategy for Player 1 and p2_strategy for
-        Player 2.
+        Player 2. Every move the strategies choose is recorded by instrument
+        if one is given, under the name of the strategy.
 
         :param game: The game to be played.
         :type game:
@@ -43,6 +59,8 @@ class GameInterface:
         :type p1_strategy:
         :param p2_strategy: The strategy for Play 2.
         :type p2_strategy:
+        :param instrument: The Instrument recording the strategies' moves.
+        :type instrument:
         """
         first_player = input("Type y if player 1 is to make the first move: ")
         is_p1_turn = False
@@ -50,6 +68,12 @@ class GameInterface:
             is_p1_turn = True
 
         self.game = game(is_p1_turn)
+        self.instrument = instrument
+        if instrument is not None:
+            # recording moves under the name of the strategy choosing them,
+            # each record already holds the player it was chosen for
+            p1_strategy = instrument.wrap(p1_strategy)
+            p2_strategy = instrument.wrap(p2_strategy)
         self.p1_strategy = p1_strategy
         self.p2_strategy = p2_strategy
 
@@ -70,7 +94,7 @@ class GameInterface:
             possible_moves = current_state.get_possible_moves()
             print("The current available moves are:")
             for move in possible_moves:
-                print(move)
+                print(self.game.move_to_str(move))
 
             # Pick a (legal) move.
             while not current_state.is_valid_move(move_to_make):
@@ -86,7 +110,7 @@ class GameInterface:
             current_state = self.game.current_state
 
             print("{} made the move {}. The game's state is now:".format(
-                current_player_name, move_to_make))
+                current_player_name, self.game.move_to_str(move_to_make)))
             print(current_state)
 
         # Print out the winner of the game
@@ -97,6 +121,9 @@ class GameInterface:
         else:
             print("It's a tie!")
 
+        if self.instrument is not None:
+            print(self.instrument.summary())
+
 
 if __name__ == '__main__':
     games = ", ".join(["'{}': {}".format(key, playable_games[key].__name__) if
@@ -123,5 +150,15 @@ if __name__ == '__main__':
     while p2 not in usable_strategies.keys():
         p2 = input("Select the strategy for Player 2 ({}): ".format(strategies))
 
-    GameInterface(playable_games[chosen_game], usable_strategies[p1],
-                  usable_strategies[p2]).play()
+    # building every Stonehenge board layout up front rather than mid-game
+    build_topologies()
+    # the strategies are instrumented when a file to write the record of
+    # every move to is given, e.g. python game_interface.py moves.jsonl
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "w") as moves_file:
+            GameInterface(playable_games[chosen_game], usable_strategies[p1],
+                          usable_strategies[p2],
+                          Instrument(moves_file)).play()
+    else:
+        GameInterface(playable_games[chosen_game], usable_strategies[p1],
+                      usable_strategies[p2]).play()
@@ -13,6 +13,7 @@ class GameState:
     DRAW - score if player is in a tied position
     p1_turn - whether it is p1's turn or not
     """
+    __slots__ = ("p1_turn",)
     WIN: int = 1
     LOSE: int = -1
     DRAW: int = 0
@@ -53,6 +54,22 @@ class GameState:
         """
         raise NotImplementedError
 
+    def apply(self, move: Any) -> Any:
+        """
+        Apply move to this GameState in place, and return a token which undo
+        takes to restore it. Optional: searches can call it instead of
+        make_move to walk a game tree on a single state.
+        """
+        raise NotImplementedError
+
+    def undo(self, token: Any) -> None:
+        """
+        Take back the move applied to this GameState by the apply call which
+        returned token. Moves must be taken back in the reverse order they
+        were applied.
+        """
+        raise NotImplementedError
+
     def is_valid_move(self, move: Any) -> bool:
         """
         Return whether move is a valid move for this GameState.
@@ -66,6 +83,35 @@ class GameState:
         """
         raise NotImplementedError
 
+    def table_key(self) -> Any:
+        """
+        Return a hashable key identifying this state, including the player to
+        move, for use in transposition tables.
+        """
+        return repr(self), self.get_current_player_name()
+
+    def __hash__(self) -> int:
+        """
+        Return a hash of this state consistent with __eq__. Subclasses keep a
+        Zobrist hash up to date instead of hashing table_key.
+        """
+        return hash(self.table_key())
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether this state and other are the same position with the
+        same player to move.
+        """
+        return type(self) == type(other) and \
+            self.table_key() == other.table_key()
+
+    def terminal_value(self) -> int:
+        """
+        Return WIN if the current player has won the game at this state, LOSE
+        if they have lost and DRAW if the game is tied or not over.
+        """
+        raise NotImplementedError
+
     def rough_outcome(self) -> float:
         """
         Return an estimate in interval [LOSE, WIN] of best outcome the current
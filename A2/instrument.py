@@ -0,0 +1,331 @@
+"""
+Opt-in instrumentation of strategies, recording for every move chosen the time
+taken, the states created, applied and searched, the search tree size and the
+transposition table hit rate.
+
+Nothing is changed while no instrumented strategy is choosing a move, so play
+without instrumentation runs at full speed.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, IO, List, Tuple, Union
+from a2_tree import MinimaxTree, MinimaxFrame, MCTSNode
+from game import Game
+from strategy import SEARCH_REPORTS
+from transposition import TranspositionTable
+
+# upper bounds, in seconds, of the buckets of the move time histogram; the last
+# bucket holds every slower move
+HISTOGRAM_BOUNDS = [0.001, 0.01, 0.1, 1.0, 10.0]
+# width of the longest bar of the histogram
+HISTOGRAM_WIDTH = 40
+
+
+class MoveRecord:
+    """
+    Measurements of one move chosen by an instrumented strategy.
+
+    ===Attributes===
+    strategy: name of the strategy
+    player: name of the player the move was chosen for
+    move: move chosen
+    elapsed: wall-clock seconds taken to choose the move
+    make_move: number of make_move calls
+    apply: number of apply calls, made by searches changing a state in place
+    possible_moves: number of get_possible_moves calls
+    peak_tree: largest number of search tree nodes alive at once, as reported
+    by the strategy, or else the number of tree nodes created
+    cache_hits: number of transposition table lookups which found a score
+    cache_misses: number of transposition table lookups which found nothing
+    """
+    strategy: str
+    player: str
+    move: Union[str, int]
+    elapsed: float
+    make_move: int
+    apply: int
+    possible_moves: int
+    peak_tree: int
+    cache_hits: int
+    cache_misses: int
+
+    def __init__(self, strategy: str, player: str) -> None:
+        """
+        Create an empty MoveRecord of a move chosen by strategy for player.
+
+        >>> r = MoveRecord("mr", "p1")
+        >>> r.move is None, r.make_move, r.hit_rate()
+        (True, 0, 0.0)
+        """
+        self.strategy = strategy
+        self.player = player
+        self.move = None
+        self.elapsed = 0.0
+        self.make_move = 0
+        self.apply = 0
+        self.possible_moves = 0
+        self.peak_tree = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def hit_rate(self) -> float:
+        """
+        Return the fraction of transposition table lookups which found a
+        score, 0 if there were none.
+
+        >>> r = MoveRecord("mrt", "p1")
+        >>> r.cache_hits, r.cache_misses = 1, 3
+        >>> r.hit_rate()
+        0.25
+        """
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the measurements of this MoveRecord as a dictionary.
+
+        >>> sorted(MoveRecord("mr", "p1").to_dict())[:3]
+        ['apply', 'cache_hits', 'cache_misses']
+        """
+        return {"strategy": self.strategy, "player": self.player,
+                "move": self.move, "elapsed": self.elapsed,
+                "make_move": self.make_move, "apply": self.apply,
+                "possible_moves": self.possible_moves,
+                "peak_tree": self.peak_tree, "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "hit_rate": self.hit_rate()}
+
+
+class Instrument:
+    """
+    Records a MoveRecord for every move chosen by the strategies it wraps.
+
+    While a wrapped strategy chooses a move, the make_move, apply and
+    get_possible_moves methods of the game's state class, the tree node
+    classes and TranspositionTable.lookup are replaced by counting versions,
+    and restored afterwards. Work done in other processes is not counted, and
+    counts from several threads at once may be approximate.
+
+    ===Attributes===
+    records: record of every move chosen, in order
+    stream: file each record is written to as a line of JSON, if any
+    """
+    records: List[MoveRecord]
+    stream: IO[str]
+
+    def __init__(self, stream: IO[str] = None) -> None:
+        """
+        Create an Instrument with no records, writing each new record to
+        stream as a line of JSON if stream is given.
+
+        >>> Instrument().records
+        []
+        """
+        self.records = []
+        self.stream = stream
+
+    def wrap(self, strategy: Callable[[Game], Union[str, int]],
+             name: str = None) -> Callable[[Game], Union[str, int]]:
+        """
+        Return a strategy choosing the same moves as strategy, recording each
+        of them under name, the name of strategy by default.
+
+        >>> from stonehenge import StonehengeGame
+        >>> from strategy import recursive_minimax_strategy
+        >>> i = Instrument()
+        >>> g = StonehengeGame(True, 1)
+        >>> i.wrap(recursive_minimax_strategy, "mr")(g)
+        2
+        >>> r = i.records[0]
+        >>> r.strategy, r.player, r.make_move, r.possible_moves
+        ('mr', 'p1', 3, 1)
+        >>> from strategy import inplace_minimax_strategy
+        >>> i.wrap(inplace_minimax_strategy, "mu")(g)
+        2
+        >>> r = i.records[1]
+        >>> r.make_move, r.apply, r.peak_tree
+        (0, 3, 2)
+        """
+        name = strategy.__name__ if name is None else name
+
+        def instrumented(game: Game) -> Union[str, int]:
+            """
+            Return the move strategy chooses for game, recording it.
+            """
+            record = MoveRecord(name, game.current_state
+                                .get_current_player_name())
+            record.move = self.measure(strategy, game, record)
+            self.records.append(record)
+            if self.stream is not None:
+                self.stream.write(json.dumps(record.to_dict()) + "\n")
+            return record.move
+        instrumented.__name__ = strategy.__name__
+        return instrumented
+
+    def measure(self, strategy: Callable[[Game], Union[str, int]],
+                game: Game, record: MoveRecord) -> Union[str, int]:
+        """
+        Return the move strategy chooses for game, filling in record with
+        the measurements of choosing it.
+        """
+        counts = {"make_move": 0, "apply": 0, "get_possible_moves": 0,
+                  "nodes": 0, "hits": 0, "misses": 0}
+        patched = [(type(game.current_state), "make_move",
+                    _counter(counts, "make_move")),
+                   (type(game.current_state), "apply",
+                    _counter(counts, "apply")),
+                   (type(game.current_state), "get_possible_moves",
+                    _counter(counts, "get_possible_moves")),
+                   (TranspositionTable, "lookup", _lookup_counter(counts))] + \
+                  [(tree, "__init__", _counter(counts, "nodes"))
+                   for tree in [MinimaxTree, MinimaxFrame, MCTSNode]]
+        originals = [_patch(cls, attribute, wrapper)
+                     for cls, attribute, wrapper in patched]
+        reports = dict(SEARCH_REPORTS)
+        start = time.perf_counter()
+        try:
+            move = strategy(game)
+        finally:
+            record.elapsed = time.perf_counter() - start
+            for (cls, attribute, _), original in zip(patched, originals):
+                _unpatch(cls, attribute, original)
+        record.make_move = counts["make_move"]
+        record.apply = counts["apply"]
+        record.possible_moves = counts["get_possible_moves"]
+        record.cache_hits = counts["hits"]
+        record.cache_misses = counts["misses"]
+        # a strategy tracking the nodes it keeps alive reports them itself
+        peaks = [SEARCH_REPORTS[key].peak_nodes for key in SEARCH_REPORTS
+                 if SEARCH_REPORTS[key] is not reports.get(key)]
+        record.peak_tree = max(peaks) if peaks and max(peaks) > 0 \
+            else counts["nodes"]
+        return move
+
+    def summary(self) -> str:
+        """
+        Return a summary of the records of each strategy: the moves chosen,
+        the totals and averages of their measurements, and a histogram of
+        the time taken per move.
+
+        >>> i = Instrument()
+        >>> i.records.append(MoveRecord("mr", "p1"))
+        >>> print(i.summary().splitlines()[0])
+        mr: 1 moves, 0.000s total, 0.000000s mean, 0.000000s max
+        """
+        names = []
+        for record in self.records:
+            if record.strategy not in names:
+                names.append(record.strategy)
+        lines = []
+        for name in names:
+            records = [r for r in self.records if r.strategy == name]
+            times = [r.elapsed for r in records]
+            hits = sum([r.cache_hits for r in records])
+            lookups = hits + sum([r.cache_misses for r in records])
+            lines.append("{}: {} moves, {:.3f}s total, {:.6f}s mean, "
+                         "{:.6f}s max".format(name, len(records), sum(times),
+                                               sum(times) / len(records),
+                                               max(times)))
+            lines.append("  make_move {}, apply {}, get_possible_moves {}, "
+                         "peak tree {}, cache hit rate {:.1%}".format(
+                             sum([r.make_move for r in records]),
+                             sum([r.apply for r in records]),
+                             sum([r.possible_moves for r in records]),
+                             max([r.peak_tree for r in records]),
+                             hits / lookups if lookups else 0.0))
+            for label, count in _histogram(times):
+                lines.append("  {:>8} {:>6} {}".format(
+                    label, count,
+                    "#" * -(-count * HISTOGRAM_WIDTH // len(records)))
+                             .rstrip())
+        return "\n".join(lines)
+
+
+def _counter(counts: Dict[str, int], key: str) -> Callable[[Callable],
+                                                           Callable]:
+    """
+    Return a function wrapping a method so that every call adds 1 to
+    counts[key].
+    """
+    def wrap(method: Callable) -> Callable:
+        """
+        Return method, counting its calls.
+        """
+        def counted(*args: Any, **kwargs: Any) -> Any:
+            """
+            Count this call and make it.
+            """
+            counts[key] += 1
+            return method(*args, **kwargs)
+        return counted
+    return wrap
+
+
+def _lookup_counter(counts: Dict[str, int]) -> Callable[[Callable], Callable]:
+    """
+    Return a function wrapping TranspositionTable.lookup so that every call
+    adds 1 to counts["hits"] or counts["misses"].
+    """
+    def wrap(method: Callable) -> Callable:
+        """
+        Return method, counting its hits and misses.
+        """
+        def counted(table: TranspositionTable, key: Any) -> Any:
+            """
+            Make this lookup and count whether it found a score.
+            """
+            score = method(table, key)
+            counts["misses" if score is None else "hits"] += 1
+            return score
+        return counted
+    return wrap
+
+
+def _patch(cls: type, attribute: str,
+           wrapper: Callable[[Callable], Callable]) -> Any:
+    """
+    Replace the method attribute of cls by wrapper applied to it, and return
+    what cls itself held under attribute, None if it inherited the method.
+    """
+    original = cls.__dict__.get(attribute)
+    setattr(cls, attribute, wrapper(getattr(cls, attribute)))
+    return original
+
+
+def _unpatch(cls: type, attribute: str, original: Any) -> None:
+    """
+    Undo _patch, given what it returned.
+    """
+    if original is None:
+        delattr(cls, attribute)
+    else:
+        setattr(cls, attribute, original)
+
+
+def _histogram(times: List[float]) -> List[Tuple[str, int]]:
+    """
+    Return the label and number of times in each bucket of the move time
+    histogram.
+
+    >>> _histogram([0.0005, 0.002, 0.003, 20.0])
+    [('<1ms', 1), ('<10ms', 2), ('<100ms', 0), ('<1s', 0), ('<10s', 0), \
+('>=10s', 1)]
+    """
+    labels = ["<{}".format("{:g}ms".format(bound * 1000) if bound < 1
+                           else "{:g}s".format(bound))
+              for bound in HISTOGRAM_BOUNDS]
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for elapsed in times:
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS) and \
+                elapsed >= HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        counts[bucket] += 1
+    return list(zip(labels + [">={:g}s".format(HISTOGRAM_BOUNDS[-1])],
+                    counts))
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
@@ -1,3 +1,257 @@
+"""
+Stonehenge game and state classes, along with helper functions for creating and
+updating the board and ley-lines.
+"""
+import random
+from bisect import bisect_left
+from itertools import permutations
+from typing import Any, Dict, List, Set, Tuple, Union
+from game import Game
+from game_state import GameState
+
+# letters making up the labels of unclaimed cells on the board
+POSS_VAL = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M",
+            "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z"]
+
+
+class StonehengeTopology:
+    """
+    Static layout of a Stonehenge board of one size, built once and shared by
+    every state of that size. Never mutated after it is built.
+
+    Cells are identified by their index in board order, which is the move
+    that claims them; labels are only used to show and read moves.
+
+    ===Attributes===
+    size: side-length of the board
+    rows: cell labels of each row of the board
+    cells: cell labels in board order
+    cell_index: index of each cell label in cells
+    label_width: length of the longest cell label
+    cell_positions: row and column of each cell on the board
+    cell_lines: indices of the ley-lines passing through each cell
+    cell_line_positions: position of each cell in each of its ley-lines,
+                         counting the ley-line's marker as position 0
+    line_cells: indices of the cells of each ley-line
+    line_lengths: number of cells in each ley-line
+    line_thresholds: number of cells needed to claim each ley-line
+    win_threshold: number of ley-lines needed to win the game
+    cell_keys: random 64-bit keys of each cell held by player 1 and player 2
+    line_keys: random 64-bit keys of each ley-line claimed by player 1 and
+               player 2
+    turn_key: random 64-bit key of player 1 being the player to move
+    symmetries: index each cell is moved to by each rotation or reflection of
+                the board, the first of which is the identity
+    line_symmetries: index each ley-line is moved to by each symmetry
+    inverses: index of the symmetry undoing each symmetry
+    template: picture of the board, with a format field numbered i in place
+              of the cell with index i, followed by fields for the ley-line
+              markers
+    """
+    size: int
+    rows: Tuple[Tuple[str, ...], ...]
+    cells: Tuple[str, ...]
+    cell_index: Dict[str, int]
+    label_width: int
+    cell_positions: Tuple[Tuple[int, int], ...]
+    cell_lines: Tuple[Tuple[int, ...], ...]
+    cell_line_positions: Tuple[Tuple[int, ...], ...]
+    line_cells: Tuple[Tuple[int, ...], ...]
+    line_lengths: Tuple[int, ...]
+    line_thresholds: Tuple[int, ...]
+    win_threshold: int
+    cell_keys: Tuple[Tuple[int, int], ...]
+    line_keys: Tuple[Tuple[int, int], ...]
+    turn_key: int
+    symmetries: Tuple[Tuple[int, ...], ...]
+    line_symmetries: Tuple[Tuple[int, ...], ...]
+    inverses: Tuple[int, ...]
+    template: str
+    _cell_tables: List[List[List[int]]]
+    _line_tables: List[List[List[int]]]
+
+    def __init__(self, size: int) -> None:
+        """
+        Build the topology of a board of side-length size.
+
+        >>> t = StonehengeTopology(1)
+        >>> t.rows
+        (('A', 'B'), ('C',))
+        >>> t.cell_lines[0], t.cell_line_positions[0]
+        ((0, 2, 5), (1, 1, 1))
+        >>> t.line_thresholds
+        (1, 1, 1, 1, 1, 1)
+        >>> len(t.symmetries)
+        6
+        >>> StonehengeTopology(6).cells[-3:]
+        ('AE', 'AF', 'AG')
+        """
+        # rows of 2 up to size + 1 cells, followed by a row of size cells
+        count = (size + 1) * (size + 2) // 2 - 1 + size
+        board = create_stonehenge_board(size, [cell_label(i)
+                                               for i in range(count)])
+        ley_lines = get_ley_lines(board, size)
+        self.size = size
+        self.rows = tuple(tuple(row) for row in board)
+        self.cells = tuple(gather_list(board))
+        self.cell_index = {cell: i for i, cell in enumerate(self.cells)}
+        self.label_width = max(len(cell) for cell in self.cells)
+        self.cell_positions = tuple((r, c) for r, row in enumerate(board)
+                                    for c in range(len(row)))
+        self.line_cells = tuple(tuple(self.cell_index[cell]
+                                      for cell in line[1:])
+                                for line in ley_lines)
+        self.cell_lines = tuple(tuple(j for j in range(len(self.line_cells))
+                                      if i in self.line_cells[j])
+                                for i in range(len(self.cells)))
+        self.cell_line_positions = tuple(
+            tuple(self.line_cells[j].index(i) + 1 for j in lines)
+            for i, lines in enumerate(self.cell_lines))
+        self.line_lengths = tuple(len(line) for line in self.line_cells)
+        self.line_thresholds = tuple((length + 1) // 2
+                                     for length in self.line_lengths)
+        self.win_threshold = (len(self.line_cells) + 1) // 2
+        # seeding with the size so that every process hashes alike
+        keys = random.Random(size)
+        self.cell_keys = tuple((keys.getrandbits(64), keys.getrandbits(64))
+                               for _ in self.cells)
+        self.line_keys = tuple((keys.getrandbits(64), keys.getrandbits(64))
+                               for _ in self.line_cells)
+        self.turn_key = keys.getrandbits(64)
+        self.symmetries = _board_symmetries(size)
+        lines = [frozenset(line) for line in self.line_cells]
+        self.line_symmetries = tuple(
+            tuple(lines.index(frozenset(symmetry[i] for i in line))
+                  for line in lines) for symmetry in self.symmetries)
+        self.inverses = tuple(
+            self.symmetries.index(tuple(sorted(
+                range(len(self.cells)), key=lambda i, s=symmetry: s[i])))
+            for symmetry in self.symmetries)
+        self._cell_tables = [_mask_tables(symmetry)
+                             for symmetry in self.symmetries]
+        self._line_tables = [_mask_tables(symmetry)
+                             for symmetry in self.line_symmetries]
+        fields = ["{{{}}}".format(i) for i in
+                  range(len(self.cells) + len(self.line_cells))]
+        self.template = _board_layout(size, self.label_width,
+                                      fields[:len(self.cells)],
+                                      fields[len(self.cells):])
+
+    def __reduce__(self) -> Tuple[Any, Tuple[int]]:
+        """
+        Return how to pickle this topology: by its size alone, so that an
+        unpickled state shares the topology built for its size rather than
+        carrying a copy of it.
+
+        >>> import pickle
+        >>> s = pickle.loads(pickle.dumps(StonehengeState(True, 3)))
+        >>> s.topology is get_topology(3)
+        True
+        """
+        return get_topology, (self.size,)
+
+    def transform_mask(self, mask: int, symmetry: int,
+                       lines: bool = False) -> int:
+        """
+        Return the bitmask of cells, or of ley-lines if lines, that mask is
+        moved to by symmetry.
+
+        >>> t = StonehengeTopology(1)
+        >>> [t.transform_mask(0b001, k) for k in range(6)]
+        [1, 2, 1, 2, 4, 4]
+        """
+        result = 0
+        for table in (self._line_tables if lines else
+                      self._cell_tables)[symmetry]:
+            result |= table[mask & 0xFF]
+            mask >>= 8
+        return result
+
+    def render(self, cells: List[Union[str, int]],
+               markers: List[Union[str, int]]) -> str:
+        """
+        Return the picture of a board of this size whose cells, in board
+        order, and ley-line markers are cells and markers, padded to the
+        width of the longest cell label.
+
+        >>> t = StonehengeTopology(1)
+        >>> t.render(["A", 2, "C"], ["@", 2, "@", 2, "@", 2]).splitlines()[3]
+        '@ - A - 2 '
+        """
+        if self.label_width > 1:
+            return self.template.format(
+                *[str(value).center(self.label_width)
+                  for value in cells + markers])
+        return self.template.format(*(cells + markers))
+
+    def transform_move(self, move: int, symmetry: int) -> int:
+        """
+        Return the cell that the cell move is moved to by symmetry. A move
+        chosen in a transformed position is translated back with the inverse
+        of its symmetry.
+
+        >>> t = StonehengeTopology(2)
+        >>> t.transform_move(0, 3)
+        4
+        >>> t.transform_move(4, t.inverses[3])
+        0
+        """
+        return self.symmetries[symmetry][move]
+
+    def canonical(self, cells1: int, cells2: int, lines1: int,
+                  lines2: int) -> Tuple[Tuple[int, int, int, int], int]:
+        """
+        Return the least image of the cell and ley-line bitmasks of both
+        players under the symmetries of the board, along with the symmetry
+        that gives it.
+
+        >>> t = StonehengeTopology(2)
+        >>> t.canonical(0b0000010, 0, 0, 0)
+        ((1, 0, 0, 0), 1)
+        >>> t.canonical(0b1000000, 0, 0, 0)
+        ((1, 0, 0, 0), 5)
+        """
+        best, best_symmetry = None, 0
+        for symmetry in range(len(self.symmetries)):
+            image = (self.transform_mask(cells1, symmetry),
+                     self.transform_mask(cells2, symmetry),
+                     self.transform_mask(lines1, symmetry, True),
+                     self.transform_mask(lines2, symmetry, True))
+            if best is None or image < best:
+                best, best_symmetry = image, symmetry
+        return best, best_symmetry
+
+
+# topology of each board size built so far, shared by all states of that size
+TOPOLOGIES: Dict[int, StonehengeTopology] = {}
+
+
+def get_topology(size: int) -> StonehengeTopology:
+    """
+    Return the topology of boards of side-length size, building it the first
+    time it is requested.
+
+    >>> get_topology(2) is get_topology(2)
+    True
+    """
+    if size not in TOPOLOGIES:
+        TOPOLOGIES[size] = StonehengeTopology(size)
+    return TOPOLOGIES[size]
+
+
+def build_topologies(sizes: List[int] = None) -> None:
+    """
+    Build the topologies of every size in sizes ahead of time, by default all
+    sizes from 1 to 5, the sizes played interactively.
+
+    >>> build_topologies([1, 3])
+    >>> 3 in TOPOLOGIES
+    True
+    """
+    for size in range(1, 6) if sizes is None else sizes:
+        get_topology(size)
+
+
 class StonehengeGame(Game):
     """
     Class to model Stonehenge Game.
@@ -11,17 +265,21 @@ class StonehengeGame(Game):
     current_state: 'StonehengeState'
     instructions: str
 
-    def __init__(self, p1_starts: bool) -> None:
+    def __init__(self, p1_starts: bool, size: int = None) -> None:
         """
         Initialize this Game, using p1_starts to find who the first player is.
+        The board size is asked for through input unless size is given.
 
-        ~Doctests omitted due to use of input~
+        >>> g = StonehengeGame(True, 2)
+        >>> g.current_state.get_possible_moves()
+        [0, 1, 2, 3, 4, 5, 6]
         """
         self.p1_turn = p1_starts
         # retrieving size of board through input, dont put this into state class
         # since we return new states when a move is made and cant answer input
         # when it is constructed
-        size = int(input("Enter the size of the game board:"))
+        if size is None:
+            size = int(input("Enter the size of the game board:"))
         # creating state
         self.current_state = StonehengeState(self.p1_turn, size)
         # setting instructions
@@ -35,7 +293,7 @@ class StonehengeGame(Game):
                             "additional cell up until there's a row with \n" \
                             "n+1 cells, after which the last row has only " \
                             "n cells in it. Players take turns claiming \n" \
-                            "cells (abbreviated with a capital letter). " \
+                            "cells (labelled with capital letters). " \
                             "When a player captures at least half of the \n" \
                             "cells in a ley-line (lines extending from " \
                             "each third of the hexagon to the other side),\n" \
@@ -56,29 +314,13 @@ class StonehengeGame(Game):
         """
         Return whether or not this game is over at state.
 
-        ~Doctests omitted due to use of input~
+        >>> g = StonehengeGame(True, 1)
+        >>> g.is_over(g.current_state)
+        False
+        >>> g.is_over(g.current_state.make_move(0))
+        True
         """
-        count1, count2 = 0, 0
-        # counting ley line markers to evaluate games ending condition
-        for i in state.ley_lines:
-            if i[0] == 1:
-                count1 += 1
-            elif i[0] == 2:
-                count2 += 1
-        # determining if counts are at least half of an even length of ley lines
-        if len(state.ley_lines) % 2 == 0:
-            if count1 >= (len(state.ley_lines) / 2):
-                return True
-            elif count2 >= (len(state.ley_lines) / 2):
-                return True
-            return False
-        # determining if counts are at least half of an odd length of ley lines
-        else:
-            if count1 >= (len(state.ley_lines) // 2) + 1:
-                return True
-            elif count2 >= (len(state.ley_lines) // 2) + 1:
-                return True
-            return False
+        return state.is_over()
 
     def is_winner(self, player: str) -> bool:
         """
@@ -86,26 +328,51 @@ class StonehengeGame(Game):
 
         Precondition: player is 'p1' or 'p2'.
 
-        ~Doctests omitted due to use of input~
+        >>> g = StonehengeGame(True, 1)
+        >>> g.is_winner("p1")
+        False
+        >>> g.current_state = g.current_state.make_move(0)
+        >>> g.is_winner("p1"), g.is_winner("p2")
+        (True, False)
+        """
+        return self.score(self.current_state, player) == GameState.WIN
+
+    def score(self, state: 'StonehengeState', player: str) -> int:
         """
-        # assures that game is over before evaluating winner
-        if not self.is_over(self.current_state):
-            return False
-        # if game is over and current player is player, the other player has won
-        elif self.current_state.curr_player == player:
-            return False
-        return True
+        Return GameState.WIN if player has won at state, GameState.LOSE if
+        player has lost and GameState.DRAW otherwise, without changing this
+        Game.
+
+        Precondition: player is 'p1' or 'p2'.
+
+        >>> g = StonehengeGame(True, 1)
+        >>> s = g.current_state.make_move(0)
+        >>> g.score(s, "p1"), g.score(s, "p2"), g.score(g.current_state, "p1")
+        (1, -1, 0)
+        """
+        value = state.terminal_value()
+        return value if state.get_current_player_name() == player else -value
 
     def str_to_move(self, string: str) -> Any:
         """
-        Return the move that string represents. If string is not a move,
-        return some invalid move.
+        Return the cell whose label is string, ignoring case. If string is not
+        a move, return some invalid move.
 
-        ~Doctests omitted due to use of input~
+        >>> g = StonehengeGame(True, 2)
+        >>> g.str_to_move("c"), g.str_to_move("Z")
+        (2, -1)
         """
-        assert isinstance(string, str) and string.upper() in POSS_VAL, \
-            "Move must be a letter of the alphabet"
-        return string
+        return self.current_state.topology.cell_index.get(
+            string.strip().upper(), -1) if isinstance(string, str) else -1
+
+    def move_to_str(self, move: Any) -> str:
+        """
+        Return the label of the cell move.
+
+        >>> StonehengeGame(True, 6).move_to_str(26)
+        'AA'
+        """
+        return self.current_state.topology.cells[move]
 
 
 class StonehengeState(GameState):
@@ -117,11 +384,30 @@ class StonehengeState(GameState):
     size: size of the game board
     board: current cells of the game board
     ley_lines: ley line values of current state
+    claimed1: number of ley-lines claimed by player 1
+    claimed2: number of ley-lines claimed by player 2
+    free: indices of the unclaimed cells of the board, in increasing order
+    topology: static layout shared by states of this size
+    zobrist: 64-bit hash of the board, ley-lines and player to move
+    shared: whether board rows and ley-lines may be shared with other states
+
+    Rows of the board and ley-lines are shared between a state and the
+    states made from it by make_move, which copies only the row and
+    ley-lines passing through its cell. Once shared they are never changed:
+    apply first gives a shared state copies of its own to change in place.
     """
+    __slots__ = ("curr_player", "size", "topology", "board", "ley_lines",
+                 "claimed1", "claimed2", "free", "zobrist", "shared")
     curr_player: str
     size: int
-    board: List[List[str]]
-    ley_lines: List[List[str]]
+    topology: StonehengeTopology
+    board: List[List[Union[str, int]]]
+    ley_lines: List[List[Union[str, int]]]
+    claimed1: int
+    claimed2: int
+    free: List[int]
+    zobrist: int
+    shared: bool
 
     def __init__(self, is_p1_turn: bool, size: int) -> None:
         """
@@ -133,88 +419,35 @@ class StonehengeState(GameState):
         [['A', 'B'], ['C', 'D', 'E'], ['F', 'G', 'H', 'I'], ['J', 'K', 'L']]
         """
         super().__init__(is_p1_turn)
-        assert 5 >= size > 0, "Board size must be a positive integer and no " \
-                              "greater than 5."
+        assert size > 0, "Board size must be a positive integer."
         self.curr_player = "p2"
         if is_p1_turn:
             self.curr_player = "p1"
         self.size = size
+        self.topology = get_topology(size)
         # creating cells in Stonehenge board
-        self.board = create_stonehenge_board(self.size, POSS_VAL)
+        self.board = [list(row) for row in self.topology.rows]
         # creating ley lines
-        self.ley_lines = get_ley_lines(self.board, self.size)
+        self.ley_lines = [["@"] + [self.topology.cells[i] for i in line]
+                          for line in self.topology.line_cells]
+        # running counts of claimed ley-lines and free cells, kept up to date
+        # by make_move so that they never need to be recounted
+        self.claimed1, self.claimed2 = 0, 0
+        self.free = list(range(len(self.topology.cells)))
+        self.zobrist = self.topology.turn_key if is_p1_turn else 0
+        self.shared = False
 
     def __str__(self) -> str:
         """
         Return a string representation of the current state of the game.
+        Cells and ley-line markers are padded to the width of the longest cell
+        label and filled into the layout template of the board's topology.
 
         ~Doctests omitted due to use of \n when representing string~
         """
-        # copy of ley lines and board since we will be removing them after they
-        # are added, logic is similar to getting ley lines
-        ley_copy = copy.deepcopy(self.ley_lines)
-        board_copy = gather_list(copy.deepcopy(self.board))
-        # separating ley lines into horizontal, left diagonal and right diagonal
-        index = int(len(self.ley_lines) / 3)
-        horiz = ley_copy[:index]
-        left = ley_copy[index:2 * index]
-        right = ley_copy[2 * index:3 * index]
-        spacing = (len(self.board) - 2) * 2
-        # adding first two ley lines and their markers
-        ret_str = ""
-        ret_str += "\n{}{}   {}".format(" "*(spacing+6), left[0][0], left[1][0])
-        ret_str += "\n{}/   /".format(" "*(spacing+5))
-        # removing added vals, we will continue to do this to be able to access
-        # them from the same index
-        left = left[2:]
-        n = 2
-        while n <= self.size + 1:
-            # creating newline and adding correct spacing and horizontal ley
-            # line marker
-            ret_str += "\n{}{} -".format(" " * spacing, horiz[0][0])
-            horiz = horiz[1:]
-            spacing -= 2
-            for _i in range(n):
-                if n == self.size + 1:
-                    ret_str += " {} -".format(board_copy[0]) if _i != n-1 \
-                        else " {} ".format(board_copy[0])
-                    board_copy = board_copy[1:]
-                # if we are on the last cell of the row, we add a ley line
-                # marker and remove it from the ley lines
-                elif _i == n - 1 and n != self.size + 2:
-                    ret_str += " {}   {}".format(board_copy[0], left[0][0])
-                    left = left[1:]
-                    board_copy = board_copy[1:]
-                else:
-                    ret_str += " {} -".format(board_copy[0])
-                    board_copy = board_copy[1:]
-            n += 1
-            # adding slashes
-            if n == self.size + 2:
-                ret_str += "\n{}  \\".format(" "*(spacing+5))
-                ret_str += " {}".format("/ \\ "*(n-2))
-            elif n > 2:
-                ret_str += "\n{}{}".format(" "*(spacing+5), "/ \\ "*(n-1))
-                ret_str += "/"
-            else:
-                ret_str += "\n{}{}".format(" "*(spacing+5), "/ \\ "*(n-1))
-        # adding last row of cells, slashes and ley line markers after size+1
-        # row
-        spacing = 2
-        ret_str += "\n{}{} - ".format(" "*spacing, horiz[0][0])
-        for _j in range(self.size):
-            if _j == self.size - 1:
-                ret_str += "{}   {}".format(board_copy[0], right[0][0])
-                right = right[1:]
-            else:
-                ret_str += "{} - ".format(board_copy[0])
-                board_copy = board_copy[1:]
-        ret_str += "\n{}{}".format(" "*(spacing+5), "\\   "*self.size)
-        ret_str += "\n{}".format(" "*(spacing+6))
-        for _k in range(len(right)):
-            ret_str += "{}   ".format(right[-1][0])
-            right = right[:-1]
-        return ret_str
+        return self.topology.render(
+            [cell for row in self.board for cell in row],
+            [line[0] for line in self.ley_lines])
 
     def get_possible_moves(self) -> list:
         """
@@ -222,41 +455,31 @@ class StonehengeState(GameState):
 
         >>> s = StonehengeState(True, 1)
         >>> s.get_possible_moves()
-        ['A', 'B', 'C']
-        >>> s = StonehengeState(True, 2)
-        >>> s.get_possible_moves()
-        ['A', 'B', 'C', 'D', 'E', 'F', 'G']
-        """
-        # performing same count as in StonehengeGame.is_over() to return an
-        # empty list if the game is over
-        count1, count2 = 0, 0
-        for i in self.ley_lines:
-            if i[0] == 1:
-                count1 += 1
-            elif i[0] == 2:
-                count2 += 1
-        if len(self.ley_lines) % 2 == 0:
-            if count1 >= (len(self.ley_lines) / 2):
-                return []
-            elif count2 >= (len(self.ley_lines) / 2):
-                return []
-            moves = []
-            # returning available cells if game isnt over
-            for cell in gather_list(self.board):
-                if cell in POSS_VAL:
-                    moves.append(cell)
-            return moves
-        else:
-            if count1 >= (len(self.ley_lines) // 2) + 1:
-                return []
-            elif count2 >= (len(self.ley_lines) // 2) + 1:
-                return []
-            # returning available cells if game isnt over
-            moves = []
-            for cell in gather_list(self.board):
-                if cell in POSS_VAL:
-                    moves.append(cell)
-            return moves
+        [0, 1, 2]
+        >>> s.make_move(1).get_possible_moves()
+        []
+        >>> StonehengeState(True, 2).make_move(3).get_possible_moves()
+        [0, 1, 2, 4, 5, 6]
+        """
+        # returning an empty list if the game is over, and the available cells
+        # otherwise
+        if self.is_over():
+            return []
+        return self.free.copy()
+
+    def is_over(self) -> bool:
+        """
+        Return whether either player has claimed at least half of the
+        ley-lines.
+
+        >>> s = StonehengeState(True, 1)
+        >>> s.is_over()
+        False
+        >>> s.make_move(0).is_over()
+        True
+        """
+        threshold = self.topology.win_threshold
+        return self.claimed1 >= threshold or self.claimed2 >= threshold
 
     def get_current_player_name(self) -> str:
         """
@@ -276,47 +499,151 @@ class StonehengeState(GameState):
 
     def make_move(self, move: Any) -> 'StonehengeState':
         """
-        Return the GameState that results from applying move to this GameState.
+        Return the GameState that results from applying move, the index of a
+        free cell, to this GameState.
 
         >>> s = StonehengeState(True, 2)
         >>> s.get_current_player_name()
         'p1'
-        >>> s2 = s.make_move("A")
+        >>> s2 = s.make_move(0)
         >>> s2.get_current_player_name()
         'p2'
         >>> s2.board
         [[1, 'B'], ['C', 'D', 'E'], ['F', 'G']]
         """
-        if self.curr_player == "p1":
-            # creating new state and copying current board
-            new_state = StonehengeState(False, self.size)
-            new_state.board = copy.deepcopy(self.board)
-            # changing cells that have been taken by player
-            update_board(new_state.board, move, "p1")
-            # updating ley lines
-            new_state.ley_lines = update_ley(self.ley_lines, move, True)
-            return new_state
-
-        # creating new state and copying current board
-        new_state = StonehengeState(True, self.size)
-        new_state.board = copy.deepcopy(self.board)
-        # changing cells that have been taken by player
-        update_board(new_state.board, move, "p2")
-        # updating ley lines
-        new_state.ley_lines = update_ley(self.ley_lines, move, False)
+        is_p1 = self.curr_player == "p1"
+        # creating new state sharing this state's topology, rather than
+        # building a fresh board and ley lines only to replace them
+        new_state = StonehengeState.__new__(StonehengeState)
+        new_state.p1_turn = not is_p1
+        new_state.curr_player = "p2" if is_p1 else "p1"
+        new_state.size, new_state.topology = self.size, self.topology
+        topology = self.topology
+        player = 0 if is_p1 else 1
+        # sharing every row but the one holding the cell taken by player
+        row, column = topology.cell_positions[move]
+        new_state.board = self.board.copy()
+        new_state.board[row] = self.board[row].copy()
+        new_state.board[row][column] = player + 1
+        # updating ley lines, sharing those not through move
+        new_state.ley_lines = update_ley(self.ley_lines, move, is_p1)
+        # carrying over counts and hash, only ley-lines through move can be
+        # newly claimed
+        new_state.claimed1, new_state.claimed2 = self.claimed1, self.claimed2
+        new_state.zobrist = (self.zobrist ^ topology.turn_key ^
+                             topology.cell_keys[move][player])
+        for i in topology.cell_lines[move]:
+            if self.ley_lines[i][0] != new_state.ley_lines[i][0]:
+                new_state.zobrist ^= topology.line_keys[i][player]
+                if is_p1:
+                    new_state.claimed1 += 1
+                else:
+                    new_state.claimed2 += 1
+        index = bisect_left(self.free, move)
+        new_state.free = self.free[:index] + self.free[index + 1:]
+        self.shared = new_state.shared = True
         return new_state
 
+    def apply(self, move: Any) -> Tuple[int, int, int]:
+        """
+        Claim the cell move for the current player in place, along with any
+        ley-lines this wins, and pass the turn. Return a token for undo: the
+        move, its position among the free cells and the bitmask of ley-lines
+        it claimed.
+
+        The row and ley-lines through move are changed rather than copied. If
+        they may be shared with other states, the whole board and every
+        ley-line are copied once first, so later calls change them directly.
+
+        >>> parent = StonehengeState(True, 2)
+        >>> s = parent.make_move(3)
+        >>> token = s.apply(0)
+        >>> s == StonehengeState(True, 2).make_move(3).make_move(0)
+        True
+        >>> parent.board
+        [['A', 'B'], ['C', 'D', 'E'], ['F', 'G']]
+        >>> s.undo(token)
+        >>> s == StonehengeState(True, 2).make_move(3)
+        True
+        """
+        if self.shared:
+            self._unshare()
+        topology = self.topology
+        is_p1 = self.p1_turn
+        marker = 1 if is_p1 else 2
+        row, column = topology.cell_positions[move]
+        self.board[row][column] = marker
+        index = bisect_left(self.free, move)
+        del self.free[index]
+        self.zobrist ^= topology.turn_key ^ topology.cell_keys[move][marker - 1]
+        claimed = 0
+        for j, position in zip(topology.cell_lines[move],
+                               topology.cell_line_positions[move]):
+            line = self.ley_lines[j]
+            line[position] = marker
+            # claiming ley-line if player holds at least half of its cells
+            if line[0] == "@" and \
+                    line.count(marker) >= topology.line_thresholds[j]:
+                line[0] = marker
+                claimed |= 1 << j
+                self.zobrist ^= topology.line_keys[j][marker - 1]
+                if is_p1:
+                    self.claimed1 += 1
+                else:
+                    self.claimed2 += 1
+        self.p1_turn = not is_p1
+        self.curr_player = "p2" if is_p1 else "p1"
+        return move, index, claimed
+
+    def undo(self, token: Tuple[int, int, int]) -> None:
+        """
+        Take back the move applied by the apply call which returned token.
+        """
+        if self.shared:
+            self._unshare()
+        move, index, claimed = token
+        topology = self.topology
+        is_p1 = not self.p1_turn
+        marker = 1 if is_p1 else 2
+        label = topology.cells[move]
+        self.p1_turn = is_p1
+        self.curr_player = "p1" if is_p1 else "p2"
+        row, column = topology.cell_positions[move]
+        self.board[row][column] = label
+        self.free.insert(index, move)
+        self.zobrist ^= topology.turn_key ^ topology.cell_keys[move][marker - 1]
+        for j, position in zip(topology.cell_lines[move],
+                               topology.cell_line_positions[move]):
+            line = self.ley_lines[j]
+            line[position] = label
+            if claimed >> j & 1:
+                line[0] = "@"
+                self.zobrist ^= topology.line_keys[j][marker - 1]
+                if is_p1:
+                    self.claimed1 -= 1
+                else:
+                    self.claimed2 -= 1
+
+    def _unshare(self) -> None:
+        """
+        Give this state its own copies of the board rows and ley-lines, which
+        no other state shares.
+        """
+        self.board = [row.copy() for row in self.board]
+        self.ley_lines = [line.copy() for line in self.ley_lines]
+        self.shared = False
+
     def is_valid_move(self, move: Any) -> bool:
         """
         Return whether move is a valid move for this GameState.
 
         >>> s = StonehengeState(True, 2)
-        >>> s.is_valid_move("A")
+        >>> s.is_valid_move(0)
         True
-        >>> s.is_valid_move("Z")
-        False
+        >>> s.is_valid_move(7), s.is_valid_move("A")
+        (False, False)
         """
-        return move in self.get_possible_moves()
+        return not self.is_over() and move in self.free
 
     def __repr__(self) -> Any:
         """
@@ -339,6 +666,188 @@ class StonehengeState(GameState):
                                                              self.size,
                                                              self.curr_player)
 
+    def __hash__(self) -> int:
+        """
+        Return the Zobrist hash of this state, kept up to date by make_move.
+
+        >>> s = StonehengeState(True, 2).make_move(0).make_move(3)
+        >>> hash(s) == hash(StonehengeState(True, 2).make_move(0)
+        ...                  .make_move(3))
+        True
+        """
+        return self.zobrist
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether this state and other have the same board, ley-lines
+        and player to move. States with different hashes are told apart
+        without comparing their boards.
+
+        >>> s = StonehengeState(True, 2)
+        >>> s.make_move(0).make_move(3) == s.make_move(0).make_move(3)
+        True
+        >>> s.make_move(0).make_move(3) == s.make_move(3).make_move(0)
+        False
+        """
+        return (type(self) == type(other) and self.zobrist == other.zobrist
+                and self.curr_player == other.curr_player and
+                self.board == other.board and self.ley_lines == other.ley_lines)
+
+    def compute_zobrist(self) -> int:
+        """
+        Return the Zobrist hash of this state computed from its board and
+        ley-lines, for states whose board or ley-lines were assigned directly.
+
+        >>> s = StonehengeState(False, 3).make_move(4).make_move(1)
+        >>> s.compute_zobrist() == s.zobrist
+        True
+        """
+        topology = self.topology
+        zobrist = topology.turn_key if self.p1_turn else 0
+        for i, cell in enumerate(gather_list(self.board)):
+            if cell in (1, 2):
+                zobrist ^= topology.cell_keys[i][cell - 1]
+        for j, line in enumerate(self.ley_lines):
+            if line[0] in (1, 2):
+                zobrist ^= topology.line_keys[j][line[0] - 1]
+        return zobrist
+
+    def masks(self) -> Tuple[int, int, int, int]:
+        """
+        Return the bitmasks of the cells held by player 1 and player 2 and of
+        the ley-lines claimed by player 1 and player 2, indexed as in the
+        topology.
+
+        >>> StonehengeState(True, 1).make_move(2).masks()
+        (4, 0, 42, 0)
+        """
+        cells1, cells2, lines1, lines2 = 0, 0, 0, 0
+        for i, cell in enumerate(gather_list(self.board)):
+            if cell == 1:
+                cells1 |= 1 << i
+            elif cell == 2:
+                cells2 |= 1 << i
+        for j, line in enumerate(self.ley_lines):
+            if line[0] == 1:
+                lines1 |= 1 << j
+            elif line[0] == 2:
+                lines2 |= 1 << j
+        return cells1, cells2, lines1, lines2
+
+    def transform(self, symmetry: int) -> 'StonehengeState':
+        """
+        Return this state rotated or reflected by symmetry of the board.
+
+        >>> s = StonehengeState(True, 2).make_move(0)
+        >>> s.transform(3).board
+        [['A', 'B'], ['C', 'D', 1], ['F', 'G']]
+        """
+        topology = self.topology
+        cells = topology.symmetries[symmetry]
+        lines = topology.line_symmetries[symmetry]
+        flat: List[Union[str, int]] = list(topology.cells)
+        for i, cell in enumerate(gather_list(self.board)):
+            if cell in (1, 2):
+                flat[cells[i]] = cell
+        markers = ["@"] * len(lines)
+        for j, line in enumerate(self.ley_lines):
+            markers[lines[j]] = line[0]
+        new_state = StonehengeState.__new__(StonehengeState)
+        new_state.p1_turn = self.p1_turn
+        new_state.curr_player = self.curr_player
+        new_state.size, new_state.topology = self.size, topology
+        new_state.board = []
+        for row in topology.rows:
+            start = topology.cell_index[row[0]]
+            new_state.board.append(flat[start:start + len(row)])
+        new_state.ley_lines = [[markers[j]] + [flat[i] for i in line]
+                               for j, line in enumerate(topology.line_cells)]
+        new_state.claimed1, new_state.claimed2 = self.claimed1, self.claimed2
+        new_state.free = [i for i, cell in enumerate(topology.cells)
+                          if flat[i] == cell]
+        new_state.zobrist = new_state.compute_zobrist()
+        new_state.shared = False
+        return new_state
+
+    def canonical(self) -> Tuple['StonehengeState', int]:
+        """
+        Return the representative of this state among its rotations and
+        reflections, along with the symmetry that maps this state onto it.
+        A move m of the representative is the move
+        topology.transform_move(m, topology.inverses[symmetry]) of this state.
+
+        >>> s = StonehengeState(True, 2)
+        >>> a, _ = s.make_move(0).canonical()
+        >>> g, _ = s.make_move(6).canonical()
+        >>> a == g
+        True
+        """
+        symmetry = self.topology.canonical(*self.masks())[1]
+        return self.transform(symmetry), symmetry
+
+    def table_key(self) -> Any:
+        """
+        Return a hashable key made of the board occupancy, ley-line owners and
+        player to move, for use in transposition tables. Positions which are
+        rotations or reflections of each other share a key, since they have
+        the same minimax score.
+
+        >>> StonehengeState(True, 1).make_move(2).table_key()
+        (1, 1, 0, 37, 0, 'p2')
+        >>> s = StonehengeState(True, 2)
+        >>> s.make_move(0).table_key() == s.make_move(6).table_key()
+        True
+        """
+        return ((self.size,) + self.topology.canonical(*self.masks())[0] +
+                (self.curr_player,))
+
+    def terminal_value(self) -> int:
+        """
+        Return LOSE if the game is over, since the player to move did not make
+        the move that ended it, and DRAW otherwise.
+
+        >>> s = StonehengeState(True, 1)
+        >>> s.terminal_value(), s.make_move(0).terminal_value()
+        (0, -1)
+        """
+        return self.LOSE if self.is_over() else self.DRAW
+
+    def open_ley_lines(self, move: int) -> int:
+        """
+        Return the number of unclaimed ley-lines passing through the cell move.
+
+        >>> s = StonehengeState(True, 2)
+        >>> s.open_ley_lines(3)
+        3
+        >>> s.make_move(0).open_ley_lines(2)
+        2
+        """
+        return len([j for j in self.topology.cell_lines[move]
+                    if self.ley_lines[j][0] == "@"])
+
+    def claimable_lines(self, is_p1: bool) -> Dict[int, Set[int]]:
+        """
+        Return the indices of the ley-lines player 1, if is_p1, or player 2
+        would claim by taking each free cell.
+
+        >>> s = StonehengeState(True, 2).make_move(0).make_move(3)
+        >>> s.claimable_lines(True)[1]
+        {6}
+        >>> s.claimable_lines(False)[6]
+        {2, 5, 7}
+        """
+        marker = 1 if is_p1 else 2
+        topology = self.topology
+        claimable = {}
+        for cell in self.free:
+            claimable[cell] = set()
+            for j in topology.cell_lines[cell]:
+                line = self.ley_lines[j]
+                if line[0] == "@" and \
+                        line.count(marker) + 1 >= topology.line_thresholds[j]:
+                    claimable[cell].add(j)
+        return claimable
+
     def rough_outcome(self) -> float:
         """
         Return an estimate in interval [LOSE, WIN] of best outcome the current
@@ -349,53 +858,270 @@ class StonehengeState(GameState):
         1
         """
         # checking if rough_outcome is called on a game that is already done
-        if not self.get_possible_moves():
-            count1, count2 = 0, 0
-            for l in self.ley_lines:
-                if l[0] == 1:
-                    count1 += 1
-                elif l[0] == 2:
-                    count2 += 1
-            if len(self.ley_lines) % 2 == 0:
-                if count1 >= len(self.ley_lines) / 2:
-                    return 1 if self.get_current_player_name() == "p1" else -1
-                elif count2 >= len(self.ley_lines) / 2:
-                    return 1 if self.get_current_player_name() == "p2" else -1
-            else:
-                if count1 >= (len(self.ley_lines) // 2) + 1:
-                    return 1 if self.get_current_player_name() == "p1" else -1
-                elif count2 >= (len(self.ley_lines) // 2) + 1:
-                    return 1 if self.get_current_player_name() == "p2" else -1
-
-        # creating states for next possible move and next possible move after
-        # that
-        nstates = [self.make_move(x) for x in self.get_possible_moves()]
-        ostates = []
-        for state in nstates:
-            ostates.extend([state.make_move(y)
-                            for y in state.get_possible_moves()])
-
-        # checking if any of the first possible moves lead to an end state
-        for state in nstates:
-            if not state.get_possible_moves():
-                if self.get_current_player_name() == "p1":
-                    return 1 if state.get_current_player_name() != "p1" else -1
-                return 1 if state.get_current_player_name() != "p2" else -1
-
-        # checking if any of the next possible moves lead to an end state
-        for ostate in ostates:
-            if not ostate.get_possible_moves():
-                if self.get_current_player_name() == "p1":
-                    return 1 if ostate.get_current_player_name() != "p1" else -1
-                return 1 if ostate.get_current_player_name() != "p2" else -1
+        if self.is_over():
+            if self.claimed1 >= self.topology.win_threshold:
+                return 1 if self.get_current_player_name() == "p1" else -1
+            return 1 if self.get_current_player_name() == "p2" else -1
+
+        # checking, without making any moves, whether some move claims enough
+        # ley-lines to end the game
+        win = self.topology.win_threshold
+        mine = self.claimable_lines(self.p1_turn)
+        claimed = self.claimed1 if self.p1_turn else self.claimed2
+        if any(claimed + len(mine[cell]) >= win for cell in self.free):
+            return 1
+
+        # checking whether the opponent can end the game with a reply to any
+        # move, ley-lines claimed by that move cannot be claimed by the reply
+        theirs = self.claimable_lines(not self.p1_turn)
+        claimed = self.claimed2 if self.p1_turn else self.claimed1
+        threats = [reply for reply in self.free
+                   if claimed + len(theirs[reply]) >= win]
+        for cell in self.free:
+            for reply in threats:
+                if reply != cell and \
+                        claimed + len(theirs[reply] - mine[cell]) >= win:
+                    return -1
 
         # returning a number in range in (WIN, LOSS) if none of the conditions
         # is satisfied
-        count1, count2 = 0, 0
-        for l in self.ley_lines:
-            if l[0] == 1:
-                count1 += 1
-            elif l[0] == 2:
-                count2 += 1
+        count1, count2 = self.claimed1, self.claimed2
+        # no ley-lines have been claimed yet, so neither player is ahead
+        if max(count1, count2) == 0:
+            return self.DRAW
         return min(count1, count2) / max(count1, count2)
 
+
+def _board_symmetries(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return the index each cell of a board of side-length size is moved to by
+    each rotation and reflection of the board. The board is a triangle of
+    side-length size + 2 with its corners cut off, so its symmetries permute
+    the three barycentric coordinates of each cell.
+
+    >>> _board_symmetries(1)
+    ((0, 1, 2), (1, 0, 2), (0, 2, 1), (1, 2, 0), (2, 0, 1), (2, 1, 0))
+    """
+    side = size + 2
+    # row and column of each cell within the uncut triangle
+    places = [(r + 1, c) for r in range(size) for c in range(r + 2)] + \
+        [(side - 1, c + 1) for c in range(size)]
+    index = {place: i for i, place in enumerate(places)}
+    symmetries = []
+    for order in permutations(range(3)):
+        symmetry = []
+        for r, c in places:
+            coords = (side - 1 - r, r - c, c)
+            x, _, z = [coords[axis] for axis in order]
+            symmetry.append(index[(side - 1 - x, z)])
+        symmetries.append(tuple(symmetry))
+    return tuple(symmetries)
+
+
+def _board_layout(size: int, width: int, cells: List[str],
+                  markers: List[str]) -> str:
+    """
+    Return the picture of a Stonehenge board of side-length size showing
+    cells, in board order, and markers, the ley-line markers in topology
+    order, spaced out as if each were width characters wide. A topology lays
+    out its board once, with format fields in place of the cells and markers,
+    to get its template.
+
+    >>> layout = _board_layout(1, 1, ["A", "B", "C"], list("123456"))
+    >>> layout.splitlines()[1:4]
+    ['      3   4', '     /   /', '1 - A - B ']
+    """
+    # distance between neighbouring cells of a row, half of which is the
+    # offset between the cells of neighbouring rows
+    half = (width + 4) // 2
+    unit = 2 * half
+    dash = " {} ".format("-" * (unit - width - 2))
+    gap = " " * (unit - width)
+    slashes = "/{}\\{}".format(" " * width, " " * (unit - width - 2))
+    # separating ley lines into horizontal, left diagonal and right diagonal
+    index = len(markers) // 3
+    horiz = markers[:index]
+    left = markers[index:2 * index]
+    right = markers[2 * index:]
+    # spacing before the horizontal ley line marker of each row
+    spacing = (size - 1) * half
+    # adding first two ley lines and their markers
+    ret_str = ""
+    ret_str += "\n{}{}{}{}".format(" " * (spacing + unit + half), left[0],
+                                   gap, left[1])
+    ret_str += "\n{}/{}/".format(" " * (spacing + unit + width),
+                                 " " * (unit - 1))
+    cell = 0
+    for n in range(2, size + 2):
+        # adding the horizontal ley line marker and the n cells of the row,
+        # followed by a left diagonal marker unless it is the widest row
+        ret_str += "\n{}{}{}{}".format(" " * spacing, horiz[n - 2], dash,
+                                       dash.join(cells[cell:cell + n]))
+        cell += n
+        first = spacing + unit
+        spacing -= half
+        # adding slashes
+        if n == size + 1:
+            ret_str += " \n{}\\{}{}".format(
+                " " * (first + width), " " * (unit - width - 2),
+                slashes * (n - 1))
+        else:
+            ret_str += "{}{}\n{}{}/".format(gap, left[n], " " * (first - 1),
+                                            slashes * n)
+    # adding last row of cells, slashes and ley line markers after size+1
+    # row
+    spacing = half
+    ret_str += "\n{}{}{}{}{}{}".format(" " * spacing, horiz[-1], dash,
+                                       dash.join(cells[cell:]), gap,
+                                       right[0])
+    first = spacing + unit
+    ret_str += "\n{}{}".format(" " * (first + width),
+                               ("\\" + " " * (unit - 1)) * size)
+    ret_str += "\n{}{}".format(" " * (first + half),
+                               "".join([marker + gap
+                                        for marker in reversed(right[1:])]))
+    return ret_str
+
+
+def _mask_tables(symmetry: Tuple[int, ...]) -> List[List[int]]:
+    """
+    Return, for each byte of a bitmask over len(symmetry) bits, the image
+    under symmetry of every value of that byte.
+
+    >>> _mask_tables((1, 0))[0][1]
+    2
+    """
+    tables = []
+    for start in range(0, len(symmetry), 8):
+        table = []
+        for byte in range(256):
+            image = 0
+            for bit in range(min(8, len(symmetry) - start)):
+                if byte >> bit & 1:
+                    image |= 1 << symmetry[start + bit]
+            table.append(image)
+        tables.append(table)
+    return tables
+
+
+def create_stonehenge_board(size: int, poss_val: List[str]) -> List[List[str]]:
+    """
+    Return the cells of a Stonehenge board of side-length size, labelled in
+    order with the values of poss_val.
+
+    >>> create_stonehenge_board(1, POSS_VAL)
+    [['A', 'B'], ['C']]
+    >>> create_stonehenge_board(2, POSS_VAL)
+    [['A', 'B'], ['C', 'D', 'E'], ['F', 'G']]
+    """
+    board = []
+    index = 0
+    # rows grow from 2 cells up to size + 1 cells, last row has size cells
+    for length in list(range(2, size + 2)) + [size]:
+        board.append(poss_val[index:index + length])
+        index += length
+    return board
+
+
+def get_ley_lines(board: List[List[Union[str, int]]],
+                  size: int) -> List[List[Union[str, int]]]:
+    """
+    Return the ley-lines of board, a Stonehenge board of side-length size. Each
+    ley-line is a list starting with its marker followed by its cells.
+    Horizontal ley-lines come first, followed by the left ("/") diagonals and
+    the right ("\\") diagonals.
+
+    >>> get_ley_lines(create_stonehenge_board(1, POSS_VAL), 1)
+    [['@', 'A', 'B'], ['@', 'C'], ['@', 'A'], ['@', 'B', 'C'], \
+['@', 'B'], ['@', 'A', 'C']]
+    """
+    horiz = [["@"] + row for row in board]
+    left = [["@"] for _ in range(size + 1)]
+    right = [["@"] for _ in range(size + 1)]
+    for r, row in enumerate(board):
+        for c, cell in enumerate(row):
+            # the last row is missing the corners of the triangle, so its cells
+            # are shifted one position over
+            if r == size:
+                left[c + 1].append(cell)
+                right[size - c].append(cell)
+            else:
+                left[c].append(cell)
+                right[r - c + 1].append(cell)
+    return horiz + left + right
+
+
+def cell_label(index: int) -> str:
+    """
+    Return the label of the cell with index index in board order: the letters
+    of POSS_VAL, followed by pairs of letters AA, AB and so on, as spreadsheet
+    columns are labelled.
+
+    >>> [cell_label(i) for i in [0, 25, 26, 27, 52]]
+    ['A', 'Z', 'AA', 'AB', 'BA']
+    """
+    label = ""
+    index += 1
+    while index > 0:
+        index, letter = divmod(index - 1, len(POSS_VAL))
+        label = POSS_VAL[letter] + label
+    return label
+
+
+def gather_list(list_: List[list]) -> list:
+    """
+    Return the concatenation of the sublists of list_.
+
+    >>> gather_list([['A', 'B'], ['C']])
+    ['A', 'B', 'C']
+    """
+    return sum(list_, [])
+
+
+def update_board(board: List[List[Union[str, int]]], move: int,
+                 player: str) -> None:
+    """
+    Mutate board so that the cell move is claimed by player.
+
+    >>> b = create_stonehenge_board(1, POSS_VAL)
+    >>> update_board(b, 1, "p2")
+    >>> b
+    [['A', 2], ['C']]
+    """
+    row, column = get_topology(len(board) - 1).cell_positions[move]
+    board[row][column] = 1 if player == "p1" else 2
+
+
+def update_ley(ley_lines: List[List[Union[str, int]]], move: int,
+               is_p1: bool) -> List[List[Union[str, int]]]:
+    """
+    Return ley_lines with the cell move claimed by player 1 if is_p1 and
+    player 2 otherwise, without changing ley_lines. Unclaimed ley-lines in
+    which the player now holds at least half of the cells are claimed by the
+    player. Only the ley-lines through move, found from the board's topology,
+    are copied and examined; the others are shared with ley_lines.
+
+    >>> ley = get_ley_lines(create_stonehenge_board(1, POSS_VAL), 1)
+    >>> new_ley = update_ley(ley, 0, True)
+    >>> new_ley
+    [[1, 1, 'B'], ['@', 'C'], [1, 1], ['@', 'B', 'C'], ['@', 'B'], [1, 1, 'C']]
+    >>> new_ley[1] is ley[1], ley[0]
+    (True, ['@', 'A', 'B'])
+    """
+    marker = 1 if is_p1 else 2
+    topology = get_topology(len(ley_lines) // 3 - 1)
+    new_ley = ley_lines.copy()
+    for j, position in zip(topology.cell_lines[move],
+                           topology.cell_line_positions[move]):
+        line = new_ley[j] = ley_lines[j].copy()
+        line[position] = marker
+        # claiming ley-line if player holds at least half of its cells
+        if line[0] == "@" and \
+                line.count(marker) >= topology.line_thresholds[j]:
+            line[0] = marker
+    return new_ley
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
@@ -0,0 +1,472 @@
+"""
+Compact bitboard representation of a Stonehenge game state, for use in search.
+"""
+from typing import Any, Dict, List, Tuple, Union
+from game_state import GameState
+from stonehenge import StonehengeState, StonehengeTopology, get_topology
+
+# number of bits used for each ley-line's cell counter in a packed count, enough
+# for the ley-lines of size + 1 cells of boards up to size 14
+COUNT_BITS = 4
+COUNT_MASK = (1 << COUNT_BITS) - 1
+
+
+class StonehengeBitState(GameState):
+    """
+    Game state for Stonehenge that stores cells and ley-lines as integer
+    bitmasks, so that making a move is constant time.
+
+    ===Attributes===
+    curr_player: player whose turn it currently is
+    size: size of the game board
+    topology: static layout shared by states of this size
+    cells1: bitmask of cells claimed by player 1
+    cells2: bitmask of cells claimed by player 2
+    counts1: packed per-ley-line counts of player 1's cells
+    counts2: packed per-ley-line counts of player 2's cells
+    lines1: bitmask of ley-lines claimed by player 1
+    lines2: bitmask of ley-lines claimed by player 2
+    zobrist: 64-bit hash of the board, ley-lines and player to move, equal to
+             the hash of the equivalent StonehengeState
+    """
+    __slots__ = ("curr_player", "size", "topology", "cells1", "cells2",
+                 "counts1", "counts2", "lines1", "lines2", "zobrist")
+    curr_player: str
+    size: int
+    topology: StonehengeTopology
+    cells1: int
+    cells2: int
+    counts1: int
+    counts2: int
+    lines1: int
+    lines2: int
+    zobrist: int
+
+    def __init__(self, is_p1_turn: bool, size: int) -> None:
+        """
+        Initialize this game state and set the current player based on
+        is_p1_turn.
+
+        >>> s = StonehengeBitState(True, 3)
+        >>> s.board
+        [['A', 'B'], ['C', 'D', 'E'], ['F', 'G', 'H', 'I'], ['J', 'K', 'L']]
+        """
+        super().__init__(is_p1_turn)
+        assert 0 < size < COUNT_MASK, "Board size must be a positive integer " \
+                                      "less than {}.".format(COUNT_MASK)
+        self.curr_player = "p1" if is_p1_turn else "p2"
+        self.size = size
+        self.topology = get_topology(size)
+        self.cells1, self.cells2 = 0, 0
+        self.counts1, self.counts2 = 0, 0
+        self.lines1, self.lines2 = 0, 0
+        self.zobrist = self.topology.turn_key if is_p1_turn else 0
+
+    @classmethod
+    def from_state(cls, state: StonehengeState) -> 'StonehengeBitState':
+        """
+        Return the bitboard equivalent of state.
+
+        >>> s = StonehengeState(True, 2).make_move(0).make_move(3)
+        >>> repr(StonehengeBitState.from_state(s)) == repr(s)
+        True
+        """
+        new_state = cls(state.p1_turn, state.size)
+        topology = new_state.topology
+        for i, cell in enumerate([c for row in state.board for c in row]):
+            if cell == 1:
+                new_state.cells1 |= 1 << i
+                for line in topology.cell_lines[i]:
+                    new_state.counts1 += 1 << (COUNT_BITS * line)
+            elif cell == 2:
+                new_state.cells2 |= 1 << i
+                for line in topology.cell_lines[i]:
+                    new_state.counts2 += 1 << (COUNT_BITS * line)
+        for j, line in enumerate(state.ley_lines):
+            if line[0] == 1:
+                new_state.lines1 |= 1 << j
+            elif line[0] == 2:
+                new_state.lines2 |= 1 << j
+        new_state.zobrist = state.zobrist
+        return new_state
+
+    def to_state(self) -> StonehengeState:
+        """
+        Return the list-of-lists StonehengeState equivalent of this state.
+
+        >>> s = StonehengeBitState(True, 2).make_move(0).make_move(3)
+        >>> s.to_state().board
+        [[1, 'B'], ['C', 2, 'E'], ['F', 'G']]
+        """
+        state = StonehengeState(self.p1_turn, self.size)
+        state.board = self.board
+        state.ley_lines = self.ley_lines
+        state.claimed1 = bin(self.lines1).count("1")
+        state.claimed2 = bin(self.lines2).count("1")
+        state.free = [i for i in range(len(self.topology.cells))
+                      if not (self.cells1 | self.cells2) >> i & 1]
+        state.zobrist = self.zobrist
+        return state
+
+    @property
+    def board(self) -> List[List[Union[str, int]]]:
+        """
+        Return the cells of this state in list-of-lists form.
+
+        >>> StonehengeBitState(False, 1).make_move(1).board
+        [['A', 2], ['C']]
+        """
+        board = []
+        i = 0
+        for row in self.topology.rows:
+            board.append([self._cell_value(i + c) for c in range(len(row))])
+            i += len(row)
+        return board
+
+    @property
+    def ley_lines(self) -> List[List[Union[str, int]]]:
+        """
+        Return the ley-lines of this state in list-of-lists form.
+
+        >>> StonehengeBitState(False, 1).make_move(1).ley_lines[:2]
+        [[2, 'A', 2], ['@', 'C']]
+        """
+        return [[self._line_marker(j)] + [self._cell_value(i) for i in cells]
+                for j, cells in enumerate(self.topology.line_cells)]
+
+    def _cell_value(self, i: int) -> Union[str, int]:
+        """
+        Return the list-of-lists value of the cell with index i.
+        """
+        if self.cells1 >> i & 1:
+            return 1
+        elif self.cells2 >> i & 1:
+            return 2
+        return self.topology.cells[i]
+
+    def _line_marker(self, j: int) -> Union[str, int]:
+        """
+        Return the marker of the ley-line with index j.
+        """
+        if self.lines1 >> j & 1:
+            return 1
+        elif self.lines2 >> j & 1:
+            return 2
+        return "@"
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the current state of the game,
+        the same as that of the equivalent StonehengeState.
+
+        ~Doctests omitted due to use of \n when representing string~
+        """
+        return self.topology.render(
+            [self._cell_value(i) for i in range(len(self.topology.cells))],
+            [self._line_marker(j)
+             for j in range(len(self.topology.line_cells))])
+
+    def is_over(self) -> bool:
+        """
+        Return whether either player has claimed enough ley-lines to win.
+
+        >>> StonehengeBitState(True, 1).is_over()
+        False
+        >>> StonehengeBitState(True, 1).make_move(0).is_over()
+        True
+        """
+        threshold = self.topology.win_threshold
+        return (bin(self.lines1).count("1") >= threshold or
+                bin(self.lines2).count("1") >= threshold)
+
+    def terminal_value(self) -> int:
+        """
+        Return LOSE if the game is over, since the player to move did not make
+        the move that ended it, and DRAW otherwise.
+
+        >>> StonehengeBitState(True, 1).make_move(1).terminal_value()
+        -1
+        """
+        return self.LOSE if self.is_over() else self.DRAW
+
+    def get_possible_moves(self) -> list:
+        """
+        Return all possible moves that can be applied to this state.
+
+        >>> s = StonehengeBitState(True, 2)
+        >>> s.get_possible_moves()
+        [0, 1, 2, 3, 4, 5, 6]
+        >>> s.make_move(2).get_possible_moves()
+        [0, 1, 3, 4, 5, 6]
+        """
+        if self.is_over():
+            return []
+        taken = self.cells1 | self.cells2
+        return [i for i in range(len(self.topology.cells))
+                if not taken >> i & 1]
+
+    def get_current_player_name(self) -> str:
+        """
+        Return 'p1' if the current player is Player 1, and 'p2' if the current
+        player is Player 2.
+
+        >>> StonehengeBitState(False, 2).get_current_player_name()
+        'p2'
+        """
+        return self.curr_player
+
+    def make_move(self, move: Any) -> 'StonehengeBitState':
+        """
+        Return the GameState that results from applying move, the index of a
+        free cell, to this GameState. Only the ley-lines through the claimed
+        cell are examined.
+
+        >>> s = StonehengeBitState(True, 2).make_move(0)
+        >>> s.get_current_player_name()
+        'p2'
+        >>> s.board
+        [[1, 'B'], ['C', 'D', 'E'], ['F', 'G']]
+        """
+        topology = self.topology
+        new_state = StonehengeBitState.__new__(StonehengeBitState)
+        new_state.p1_turn = not self.p1_turn
+        new_state.curr_player = "p2" if self.p1_turn else "p1"
+        new_state.size = self.size
+        new_state.topology = topology
+        new_state.cells1, new_state.cells2 = self.cells1, self.cells2
+        new_state.counts1, new_state.counts2 = self.counts1, self.counts2
+        new_state.lines1, new_state.lines2 = self.lines1, self.lines2
+        claimed = self.lines1 | self.lines2
+        if self.p1_turn:
+            new_state.cells1 |= 1 << move
+            counts, lines = new_state.counts1, new_state.lines1
+        else:
+            new_state.cells2 |= 1 << move
+            counts, lines = new_state.counts2, new_state.lines2
+        player = 0 if self.p1_turn else 1
+        zobrist = (self.zobrist ^ topology.turn_key ^
+                   topology.cell_keys[move][player])
+        for line in topology.cell_lines[move]:
+            counts += 1 << (COUNT_BITS * line)
+            # claiming ley-line if player holds at least half of its cells
+            if not claimed >> line & 1 and \
+                    (counts >> (COUNT_BITS * line) & COUNT_MASK) >= \
+                    topology.line_thresholds[line]:
+                lines |= 1 << line
+                zobrist ^= topology.line_keys[line][player]
+        new_state.zobrist = zobrist
+        if self.p1_turn:
+            new_state.counts1, new_state.lines1 = counts, lines
+        else:
+            new_state.counts2, new_state.lines2 = counts, lines
+        return new_state
+
+    def is_valid_move(self, move: Any) -> bool:
+        """
+        Return whether move is a valid move for this GameState.
+
+        >>> s = StonehengeBitState(True, 2)
+        >>> s.is_valid_move(0)
+        True
+        >>> s.is_valid_move(7), s.is_valid_move("A")
+        (False, False)
+        """
+        return (isinstance(move, int) and 0 <= move < len(self.topology.cells)
+                and not (self.cells1 | self.cells2) >> move & 1
+                and not self.is_over())
+
+    def __repr__(self) -> Any:
+        """
+        Return a representation of this state (which can be used for
+        equality testing). Matches the representation of the equivalent
+        StonehengeState.
+
+        ~Doctests omitted due to use of \n to represent attributes~
+        """
+        return repr(self.to_state())
+
+    def open_ley_lines(self, move: int) -> int:
+        """
+        Return the number of unclaimed ley-lines passing through the cell move.
+
+        >>> StonehengeBitState(True, 2).make_move(0).open_ley_lines(2)
+        2
+        """
+        claimed = self.lines1 | self.lines2
+        return len([line for line in
+                    self.topology.cell_lines[move]
+                    if not claimed >> line & 1])
+
+    def __hash__(self) -> int:
+        """
+        Return the Zobrist hash of this state, kept up to date by make_move.
+
+        >>> s = StonehengeState(True, 2).make_move(0).make_move(3)
+        >>> hash(StonehengeBitState.from_state(s)) == hash(s)
+        True
+        """
+        return self.zobrist
+
+    def __eq__(self, other: Any) -> bool:
+        """
+        Return whether this state and other have the same board, ley-lines
+        and player to move.
+
+        >>> s = StonehengeBitState(True, 2)
+        >>> s.make_move(0).make_move(3) == s.make_move(0).make_move(3)
+        True
+        >>> s.make_move(0).make_move(3) == s.make_move(3).make_move(0)
+        False
+        """
+        return (type(self) == type(other) and self.zobrist == other.zobrist
+                and self.p1_turn == other.p1_turn and self.size == other.size
+                and self.cells1 == other.cells1 and
+                self.cells2 == other.cells2 and self.lines1 == other.lines1
+                and self.lines2 == other.lines2)
+
+    def compute_zobrist(self) -> int:
+        """
+        Return the Zobrist hash of this state computed from its bitmasks, for
+        states whose bitmasks were assigned directly.
+
+        >>> s = StonehengeBitState(False, 3).make_move(4).make_move(1)
+        >>> s.compute_zobrist() == s.zobrist
+        True
+        """
+        topology = self.topology
+        zobrist = topology.turn_key if self.p1_turn else 0
+        for i, keys in enumerate(topology.cell_keys):
+            if self.cells1 >> i & 1:
+                zobrist ^= keys[0]
+            elif self.cells2 >> i & 1:
+                zobrist ^= keys[1]
+        for j, keys in enumerate(topology.line_keys):
+            if self.lines1 >> j & 1:
+                zobrist ^= keys[0]
+            elif self.lines2 >> j & 1:
+                zobrist ^= keys[1]
+        return zobrist
+
+    def transform(self, symmetry: int) -> 'StonehengeBitState':
+        """
+        Return this state rotated or reflected by symmetry of the board.
+
+        >>> s = StonehengeBitState(True, 2).make_move(0)
+        >>> s.transform(3).board
+        [['A', 'B'], ['C', 'D', 1], ['F', 'G']]
+        """
+        topology = self.topology
+        new_state = StonehengeBitState.__new__(StonehengeBitState)
+        new_state.p1_turn = self.p1_turn
+        new_state.curr_player = self.curr_player
+        new_state.size, new_state.topology = self.size, topology
+        new_state.cells1 = topology.transform_mask(self.cells1, symmetry)
+        new_state.cells2 = topology.transform_mask(self.cells2, symmetry)
+        new_state.lines1 = topology.transform_mask(self.lines1, symmetry, True)
+        new_state.lines2 = topology.transform_mask(self.lines2, symmetry, True)
+        new_state.counts1, new_state.counts2 = 0, 0
+        for j, line in enumerate(topology.line_symmetries[symmetry]):
+            new_state.counts1 |= (self.counts1 >> (COUNT_BITS * j) &
+                                  COUNT_MASK) << (COUNT_BITS * line)
+            new_state.counts2 |= (self.counts2 >> (COUNT_BITS * j) &
+                                  COUNT_MASK) << (COUNT_BITS * line)
+        new_state.zobrist = new_state.compute_zobrist()
+        return new_state
+
+    def canonical(self) -> Tuple['StonehengeBitState', int]:
+        """
+        Return the representative of this state among its rotations and
+        reflections, along with the symmetry that maps this state onto it.
+        Follows StonehengeState.canonical.
+
+        >>> s = StonehengeBitState(True, 2)
+        >>> s.make_move(0).canonical()[0] == s.make_move(6).canonical()[0]
+        True
+        """
+        symmetry = self.topology.canonical(self.cells1, self.cells2,
+                                           self.lines1, self.lines2)[1]
+        return self.transform(symmetry), symmetry
+
+    def table_key(self) -> Any:
+        """
+        Return a hashable key made of the board occupancy, ley-line owners and
+        player to move, for use in transposition tables. Positions which are
+        rotations or reflections of each other share a key, and the key is the
+        same as that of the equivalent StonehengeState.
+
+        >>> StonehengeBitState(True, 1).make_move(2).table_key()
+        (1, 1, 0, 37, 0, 'p2')
+        """
+        return ((self.size,) +
+                self.topology.canonical(self.cells1, self.cells2,
+                                        self.lines1, self.lines2)[0] +
+                (self.curr_player,))
+
+    def claimable_lines(self, is_p1: bool) -> Dict[int, int]:
+        """
+        Return the bitmask of the ley-lines player 1, if is_p1, or player 2
+        would claim by taking each free cell.
+
+        >>> s = StonehengeBitState(True, 2).make_move(0).make_move(3)
+        >>> bin(s.claimable_lines(False)[6])
+        '0b10100100'
+        """
+        topology = self.topology
+        counts = self.counts1 if is_p1 else self.counts2
+        unclaimed = ~(self.lines1 | self.lines2)
+        taken = self.cells1 | self.cells2
+        claimable = {}
+        for i in range(len(topology.cells)):
+            if not taken >> i & 1:
+                claimable[i] = 0
+                for line in topology.cell_lines[i]:
+                    if unclaimed >> line & 1 and \
+                            (counts >> (COUNT_BITS * line) & COUNT_MASK) + 1 \
+                            >= topology.line_thresholds[line]:
+                        claimable[i] |= 1 << line
+        return claimable
+
+    def rough_outcome(self) -> float:
+        """
+        Return an estimate in interval [LOSE, WIN] of best outcome the current
+        player can guarantee from state self. Follows
+        StonehengeState.rough_outcome.
+
+        >>> s = StonehengeBitState(True, 1)
+        >>> s.rough_outcome()
+        1
+        """
+        if self.is_over():
+            threshold = self.topology.win_threshold
+            if bin(self.lines1).count("1") >= threshold:
+                return 1 if self.curr_player == "p1" else -1
+            return 1 if self.curr_player == "p2" else -1
+        win = self.topology.win_threshold
+        count1 = bin(self.lines1).count("1")
+        count2 = bin(self.lines2).count("1")
+        # a move which claims enough ley-lines wins it for the current player
+        mine = self.claimable_lines(self.p1_turn)
+        claimed = count1 if self.p1_turn else count2
+        if any(claimed + bin(lines).count("1") >= win
+               for lines in mine.values()):
+            return 1
+        # a reply which claims enough ley-lines wins it for the opponent, but
+        # cannot claim the ley-lines claimed by the move before it
+        theirs = self.claimable_lines(not self.p1_turn)
+        claimed = count2 if self.p1_turn else count1
+        threats = [reply for reply in theirs
+                   if claimed + bin(theirs[reply]).count("1") >= win]
+        for cell in mine:
+            for reply in threats:
+                if reply != cell and claimed + bin(
+                        theirs[reply] & ~mine[cell]).count("1") >= win:
+                    return -1
+        # no ley-lines have been claimed yet, so neither player is ahead
+        if max(count1, count2) == 0:
+            return self.DRAW
+        return min(count1, count2) / max(count1, count2)
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")
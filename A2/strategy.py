@@ -1,11 +1,118 @@
 """
 A module for strategies.
 """
-from typing import Union
-from a2_tree import MinimaxTree
+import math
+import os
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Dict, List, Tuple, Union
+from a2_tree import MinimaxTree, MinimaxFrame, MCTSNode
 from a2_stack import Stack
 from game import Game
 from game_state import GameState
+from transposition import TranspositionTable
+
+# transposition table shared by the table-backed minimax strategies, kept
+# between moves so that its counters can be read after each one
+MINIMAX_TABLE = TranspositionTable()
+
+
+class SearchReport:
+    """
+    Statistics of the most recent move chosen by a search strategy.
+
+    ===Attributes===
+    nodes: number of states visited by the search
+    elapsed: wall-clock seconds taken to choose the move
+    depth: deepest completed iteration of a depth-limited search, 0 if the
+    search is not depth-limited
+    peak_nodes: largest number of search nodes alive at once, 0 if not
+    tracked
+    """
+    nodes: int
+    elapsed: float
+    depth: int
+    peak_nodes: int
+
+    def __init__(self) -> None:
+        """
+        Create an empty SearchReport.
+
+        >>> r = SearchReport()
+        >>> r.nodes, r.elapsed, r.depth, r.peak_nodes
+        (0, 0.0, 0, 0)
+        """
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.depth = 0
+        self.peak_nodes = 0
+
+    def __repr__(self) -> str:
+        """
+        Return a representation of this SearchReport.
+
+        >>> SearchReport()
+        SearchReport(nodes=0, elapsed=0.000000, depth=0, peak_nodes=0)
+        """
+        return "SearchReport(nodes={}, elapsed={:.6f}, depth={}, " \
+               "peak_nodes={})".format(self.nodes, self.elapsed, self.depth,
+                                       self.peak_nodes)
+
+
+# report of the most recent move chosen by each reporting search strategy,
+# keyed by strategy name
+SEARCH_REPORTS: Dict[str, SearchReport] = {}
+
+# seconds iterative_deepening_strategy may spend choosing a move
+DEEPENING_BUDGET = 1.0
+
+# number of worker processes used by parallel_minimax_strategy
+PARALLEL_WORKERS = os.cpu_count() or 1
+
+# worker pools of the parallel strategies, kept between moves so that workers
+# are started only once, keyed by the process that created them, whether
+# they are threads and their number of workers
+PARALLEL_POOLS: Dict[Tuple[int, bool, int], Executor] = {}
+
+# playouts mcts_strategy runs per move, and the weight it gives to exploring
+# rarely visited moves
+MCTS_ITERATIONS = 1000
+MCTS_EXPLORATION = 1.4
+
+# search tree left by each player's last mcts_strategy move, keyed by player
+# name, so that the subtree of the moves since played can be reused
+MCTS_TREES: Dict[str, MCTSNode] = {}
+
+
+def _get_pool(workers: int, threads: bool) -> Executor:
+    """
+    Return the pool of workers worker processes, or threads if threads, used
+    by the parallel strategies, starting it on first use.
+
+    >>> _get_pool(2, True) is _get_pool(2, True)
+    True
+    """
+    key = (os.getpid(), threads, workers)
+    if key not in PARALLEL_POOLS:
+        pool = ThreadPoolExecutor if threads else ProcessPoolExecutor
+        PARALLEL_POOLS[key] = pool(max_workers=workers)
+        # shutting the pool down as this process exits, before its job queue
+        # is closed and before it waits for its child processes, which would
+        # otherwise wait for more jobs when this process is itself a worker
+        # of another pool
+        Finalize(PARALLEL_POOLS[key], PARALLEL_POOLS[key].shutdown,
+                 exitpriority=100)
+    return PARALLEL_POOLS[key]
+
+
+class SearchTimeout(Exception):
+    """
+    Raised when a search runs past its deadline.
+    """
+    pass
 
 
 def interactive_strategy(game: Game) -> Union[str, int]:
@@ -57,68 +164,55 @@ def rough_outcome_strategy(game: Game) -> Union[str, int]:
     return best_move
 
 
-def recursive_minimax_strategy(game: Game, game_state: GameState = None)\
+def recursive_minimax_strategy(game: Game, game_state: GameState = None,
+                               table: TranspositionTable = None)\
                                             -> Union[str, int]:
     """
     Returns move from given game state recursively using minimax strategy.
+    Scores of non-terminal states are cached in table if one is given.
     """
     # checking for optional parameter game_state
     if game_state:
         # checking if game is over
         if game.is_over(game_state):
-            curr_player = game_state.get_current_player_name()
-            orig_state = game.current_state
-            # set current state to game_state to make use of is_over(), reset
-            # state to original to assure current_state isnt changed before
-            # return
-            game.current_state = game_state
             # getting score of finished state
-            if game.is_winner(curr_player):
-                game.current_state = orig_state
-                return 1
-            elif game.is_winner("p1" if curr_player == "p2" else "p2"):
-                game.current_state = orig_state
-                return -1
-            game.current_state = orig_state
-            return 0
+            return _score_terminal(game, game_state)
+        # reusing score of a state reached through a different move order
+        if table is not None:
+            key = game_state.table_key()
+            score = table.lookup(key)
+            if score is not None:
+                return score
         # returning tuple of maximum score, and move made to achieve it
         moves = game_state.get_possible_moves()
         states = [game_state.make_move(i) for i in moves]
-        return max([-1 * recursive_minimax_strategy(game, states[x])
-                    for x in range(len(moves))])
+        score = max([-1 * recursive_minimax_strategy(game, states[x], table)
+                     for x in range(len(moves))])
+        if table is not None:
+            table.store(key, score, len(moves))
+        return score
 
     # checking if game is over
     if game.is_over(game.current_state):
-        curr_player = game.current_state.get_current_player_name()
-        orig_state = game.current_state
-        # set current state to game_state to make use of is_over(), reset state
-        # to original to assure current_state isnt changed before return
-        game.current_state = game_state
         # setting score of finished game
-        if game.is_winner(curr_player):
-            game.current_state = orig_state
-            return 1
-        elif game.is_winner("p1" if curr_player == "p2" else "p2"):
-            game.current_state = orig_state
-            return -1
-        game.current_state = orig_state
-        return 0
+        return _score_terminal(game, game.current_state)
     # returning tuple of maximum score and move made and passing optional states
     # parameter on recursive call
     moves = game.current_state.get_possible_moves()
     states = [game.current_state.make_move(i) for i in moves]
-    return max([(-1 * recursive_minimax_strategy(game, states[x]), moves[x])
-                for x in range(len(moves))])[1]
+    return max([(-1 * recursive_minimax_strategy(game, states[x], table),
+                 moves[x]) for x in range(len(moves))])[1]
 
 
-def iterative_minimax_strategy(game: Game) -> Union[str, int]:
+def iterative_minimax_strategy(game: Game, table: TranspositionTable = None)\
+                                            -> Union[str, int]:
     """
     Returns move from given game state iteratively using minimax strategy.
+    Scores of non-terminal states are cached in table if one is given.
     """
     # initializing stack to hold states and tree with root current state
     states = Stack()
     game_tree = MinimaxTree(game.current_state)
-    orig_state = game.current_state
     ret = None
     # add root to stack
     states.add(game_tree)
@@ -127,6 +221,12 @@ def iterative_minimax_strategy(game: Game) -> Union[str, int]:
         # gets all possible states stemming from root, adding them to
         # appropriate children lists, and adding them back to the stack
         if not curr.children and curr.value.get_possible_moves():
+            # reusing score of a state reached through a different move order,
+            # the root is always expanded since we need its best move
+            if table is not None and curr is not game_tree:
+                curr.score = table.lookup(curr.value.table_key())
+                if curr.score is not None:
+                    continue
             # re-add root state first to be able to satisfy terminal condition
             # after weve added all states
             states.add(curr)
@@ -137,15 +237,8 @@ def iterative_minimax_strategy(game: Game) -> Union[str, int]:
         # after states have been added, checks that the game is over at that
         # node by evaluating children and get_possible_moves()
         elif not curr.children and not curr.value.get_possible_moves():
-            game.current_state = curr.value
-            curr_player = curr.value.get_current_player_name()
             # sets score of MinimaxTree
-            if game.is_winner(curr_player):
-                curr.score = 1
-            elif game.is_winner("p1" if curr_player == "p2" else "p2"):
-                curr.score = -1
-            else:
-                curr.score = 0
+            curr.score = _score_terminal(game, curr.value)
         # if states is empty, we've reached the root, i.e. the original state;
         # evaluate this states score and best possible move by looking at the
         # scores of its children and return appropriate move
@@ -154,7 +247,562 @@ def iterative_minimax_strategy(game: Game) -> Union[str, int]:
                 ret = max([(-1 * i.score, i.move) for i in curr.children])[1]
             else:
                 curr.score = max([-1 * j.score for j in curr.children])
-    # assuring that root state is not changed by minimax simulation
-    game.current_state = orig_state
+                if table is not None:
+                    table.store(curr.value.table_key(), curr.score,
+                                len(curr.children))
     return ret
 
+
+def recursive_minimax_table_strategy(game: Game) -> Union[str, int]:
+    """
+    Returns move from given game state recursively using minimax strategy,
+    caching scores in MINIMAX_TABLE.
+    """
+    return recursive_minimax_strategy(game, table=MINIMAX_TABLE)
+
+
+def iterative_minimax_table_strategy(game: Game) -> Union[str, int]:
+    """
+    Returns move from given game state iteratively using minimax strategy,
+    caching scores in MINIMAX_TABLE.
+    """
+    return iterative_minimax_strategy(game, MINIMAX_TABLE)
+
+
+def _score_terminal(game: Game, game_state: GameState) -> int:
+    """
+    Return the score of finished game_state for its current player. Neither
+    game nor game_state is changed, so searches in several threads can share
+    them.
+    """
+    return game.score(game_state, game_state.get_current_player_name())
+
+
+def _order_moves(game_state: GameState, moves: List[Union[str, int]],
+                 ordering: str) -> List[Union[str, int]]:
+    """
+    Return moves sorted so that the most promising are searched first.
+
+    With ordering "ley", moves touching the most unclaimed ley-lines come
+    first, for states which can count them. With ordering "rough", moves
+    leaving the opponent the lowest rough_outcome() come first. Any other
+    ordering leaves moves as they are.
+    """
+    if ordering == "ley" and hasattr(game_state, "open_ley_lines"):
+        return sorted(moves, key=game_state.open_ley_lines, reverse=True)
+    elif ordering == "rough":
+        return sorted(moves,
+                      key=lambda m: game_state.make_move(m).rough_outcome())
+    return moves
+
+
+def _alphabeta(game: Game, game_state: GameState, alpha: int, beta: int,
+               report: SearchReport, ordering: str) -> int:
+    """
+    Return the minimax score of game_state for its current player, or a bound
+    on it outside of the window (alpha, beta).
+    """
+    report.nodes += 1
+    if game.is_over(game_state):
+        return _score_terminal(game, game_state)
+    best = GameState.LOSE - 1
+    for move in _order_moves(game_state, game_state.get_possible_moves(),
+                             ordering):
+        score = -1 * _alphabeta(game, game_state.make_move(move), -1 * beta,
+                                -1 * alpha, report, ordering)
+        best = max(best, score)
+        alpha = max(alpha, score)
+        # opponent will never allow this state, no need to look further
+        if alpha >= beta:
+            break
+    return best
+
+
+def alphabeta_minimax_strategy(game: Game, ordering: str = "ley")\
+                                            -> Union[str, int]:
+    """
+    Returns move from given game state using minimax strategy with alpha-beta
+    pruning, searching moves in the given ordering (see _order_moves).
+
+    The returned move is the same one recursive_minimax_strategy returns: of
+    the moves with the best score, the greatest one. The number of states
+    visited and time taken are recorded in SEARCH_REPORTS["alphabeta"].
+    """
+    report = SearchReport()
+    start = time.perf_counter()
+    game_state = game.current_state
+    report.nodes += 1
+    best_score, best_move = GameState.LOSE - 1, None
+    for move in _order_moves(game_state, game_state.get_possible_moves(),
+                             ordering):
+        # a greater move only needs to tie the best score to replace it, while
+        # a lesser one needs to beat it
+        alpha = best_score
+        if best_move is None or move > best_move:
+            alpha -= 1
+        score = -1 * _alphabeta(game, game_state.make_move(move),
+                                GameState.LOSE - 1, -1 * alpha, report,
+                                ordering)
+        if score > alpha:
+            best_score, best_move = score, move
+    report.elapsed = time.perf_counter() - start
+    SEARCH_REPORTS["alphabeta"] = report
+    return best_move
+
+
+def _inplace_alphabeta(game: Game, game_state: GameState, alpha: int,
+                       beta: int, report: SearchReport, ordering: str,
+                       depth: int) -> int:
+    """
+    Return the minimax score of game_state for its current player, or a bound
+    on it outside of the window (alpha, beta), as _alphabeta does. Moves are
+    applied to game_state itself and undone, so game_state is left as it was.
+    depth is the number of nodes on the path from the root to game_state.
+    """
+    report.nodes += 1
+    report.peak_nodes = max(report.peak_nodes, depth)
+    if game.is_over(game_state):
+        return _score_terminal(game, game_state)
+    best = GameState.LOSE - 1
+    for move in _order_moves(game_state, game_state.get_possible_moves(),
+                             ordering):
+        token = game_state.apply(move)
+        score = -1 * _inplace_alphabeta(game, game_state, -1 * beta,
+                                        -1 * alpha, report, ordering,
+                                        depth + 1)
+        game_state.undo(token)
+        best = max(best, score)
+        alpha = max(alpha, score)
+        # opponent will never allow this state, no need to look further
+        if alpha >= beta:
+            break
+    return best
+
+
+def _inplace_minimax(game: Game, game_state: GameState,
+                     report: SearchReport, depth: int) -> int:
+    """
+    Return the minimax score of game_state for its current player. Moves are
+    applied to game_state itself and undone, so game_state is left as it was.
+    depth is the number of nodes on the path from the root to game_state.
+    """
+    report.nodes += 1
+    report.peak_nodes = max(report.peak_nodes, depth)
+    if game.is_over(game_state):
+        return _score_terminal(game, game_state)
+    best = GameState.LOSE - 1
+    for move in game_state.get_possible_moves():
+        token = game_state.apply(move)
+        best = max(best, -1 * _inplace_minimax(game, game_state, report,
+                                               depth + 1))
+        game_state.undo(token)
+    return best
+
+
+def inplace_minimax_strategy(game: Game) -> Union[str, int]:
+    """
+    Returns move from given game state using minimax strategy, walking the
+    game tree by applying and undoing moves on the current state rather than
+    creating a state for every node. The current state must support apply
+    and undo, and is left as it was.
+
+    The returned move is the same one recursive_minimax_strategy returns: of
+    the moves with the best score, the greatest one. The number of states
+    visited, the length of the longest path searched and the time taken are
+    recorded in SEARCH_REPORTS["inplace"].
+    """
+    report = SearchReport()
+    start = time.perf_counter()
+    game_state = game.current_state
+    # the search keeps a node alive for every state on its current path
+    report.nodes = report.peak_nodes = 1
+    scores = []
+    for move in game_state.get_possible_moves():
+        token = game_state.apply(move)
+        scores.append((-1 * _inplace_minimax(game, game_state, report, 2),
+                       move))
+        game_state.undo(token)
+    report.elapsed = time.perf_counter() - start
+    SEARCH_REPORTS["inplace"] = report
+    return max(scores)[1]
+
+
+def inplace_alphabeta_strategy(game: Game, ordering: str = "ley")\
+                                            -> Union[str, int]:
+    """
+    Returns move from given game state as alphabeta_minimax_strategy does,
+    applying and undoing moves on the current state rather than creating a
+    state for every node. The current state must support apply and undo, and
+    is left as it was.
+
+    The number of states visited, the length of the longest path searched and
+    the time taken are recorded in SEARCH_REPORTS["inplace_alphabeta"].
+    """
+    report = SearchReport()
+    start = time.perf_counter()
+    game_state = game.current_state
+    # the search keeps a node alive for every state on its current path
+    report.nodes = report.peak_nodes = 1
+    best_score, best_move = GameState.LOSE - 1, None
+    for move in _order_moves(game_state, game_state.get_possible_moves(),
+                             ordering):
+        # a greater move only needs to tie the best score to replace it, while
+        # a lesser one needs to beat it
+        alpha = best_score
+        if best_move is None or move > best_move:
+            alpha -= 1
+        token = game_state.apply(move)
+        score = -1 * _inplace_alphabeta(game, game_state, GameState.LOSE - 1,
+                                        -1 * alpha, report, ordering, 2)
+        game_state.undo(token)
+        if score > alpha:
+            best_score, best_move = score, move
+    report.elapsed = time.perf_counter() - start
+    SEARCH_REPORTS["inplace_alphabeta"] = report
+    return best_move
+
+
+def _depth_limited(game: Game, game_state: GameState, depth: int,
+                   alpha: float, beta: float, pv: List[Union[str, int]],
+                   deadline: float, report: SearchReport)\
+        -> Tuple[float, List[Union[str, int]]]:
+    """
+    Return the alpha-beta score of game_state for its current player when
+    searched depth moves ahead, using rough_outcome() at the cutoff, along with
+    the principal variation found. Moves of pv, the principal variation of the
+    previous iteration, are searched first.
+
+    Raise SearchTimeout once deadline passes.
+    """
+    report.nodes += 1
+    if time.perf_counter() > deadline:
+        raise SearchTimeout
+    if game.is_over(game_state):
+        return _score_terminal(game, game_state), []
+    if depth == 0:
+        return game_state.rough_outcome(), []
+    moves = _order_moves(game_state, game_state.get_possible_moves(), "ley")
+    if pv and pv[0] in moves:
+        moves.remove(pv[0])
+        moves.insert(0, pv[0])
+    best, line = GameState.LOSE - 1, []
+    for move in moves:
+        score, child_line = _depth_limited(
+            game, game_state.make_move(move), depth - 1, -1 * beta,
+            -1 * alpha, pv[1:] if pv and move == pv[0] else [], deadline,
+            report)
+        if -1 * score > best:
+            best, line = -1 * score, [move] + child_line
+        alpha = max(alpha, best)
+        # opponent will never allow this state, no need to look further
+        if alpha >= beta:
+            break
+    return best, line
+
+
+def iterative_deepening_strategy(game: Game, budget: float = None)\
+                                            -> Union[str, int]:
+    """
+    Returns move from given game state by searching 1, 2, 3, ... moves ahead
+    until budget seconds have passed, DEEPENING_BUDGET by default, using
+    rough_outcome() to score states at the depth cutoff. The move found by
+    the deepest completed search is returned, and each search tries the
+    previous principal variation first. None is returned if the game is
+    over.
+
+    Nodes visited, time taken and the depth reached are recorded in
+    SEARCH_REPORTS["deepening"].
+
+    >>> from stonehenge import StonehengeGame
+    >>> g = StonehengeGame(True, 1)
+    >>> g.current_state = g.current_state.make_move(0)
+    >>> iterative_deepening_strategy(g) is None
+    True
+    """
+    budget = DEEPENING_BUDGET if budget is None else budget
+    report = SearchReport()
+    start = time.perf_counter()
+    moves = game.current_state.get_possible_moves()
+    best_move, pv = moves[0] if moves else None, []
+    depth = 1
+    try:
+        # searching deeper than the number of moves left cannot change scores
+        while depth <= len(moves):
+            _, pv = _depth_limited(game, game.current_state, depth,
+                                   GameState.LOSE - 1, GameState.WIN + 1, pv,
+                                   start + budget, report)
+            best_move, report.depth = pv[0], depth
+            depth += 1
+    except SearchTimeout:
+        pass
+    report.elapsed = time.perf_counter() - start
+    SEARCH_REPORTS["deepening"] = report
+    return best_move
+
+
+def _minimax_job(game: Game, game_state: GameState, cached: bool,
+                 threads: bool = False) -> int:
+    """
+    Return the minimax score of game_state for its current player. Run in a
+    worker by parallel_minimax_strategy; with cached, a worker process uses
+    its own MINIMAX_TABLE, and a worker thread a table of its own job, so
+    that no table is shared between threads.
+    """
+    if game.is_over(game_state):
+        return _score_terminal(game, game_state)
+    table = None
+    if cached:
+        table = TranspositionTable() if threads else MINIMAX_TABLE
+    return recursive_minimax_strategy(game, game_state, table)
+
+
+def parallel_minimax_strategy(game: Game, workers: int = None,
+                              split_depth: int = 1, cached: bool = False,
+                              threads: bool = False) -> Union[str, int]:
+    """
+    Returns move from given game state using minimax strategy, searching the
+    subtrees below the root in a pool of worker processes, or threads if
+    threads. With split_depth 1 each root child is one job, with split_depth
+    2 each grandchild is. Workers default to PARALLEL_WORKERS, and cache
+    scores if cached. The pool is started on the first call and kept for
+    later ones. Every thread shares game, since scoring finished states
+    does not change it.
+
+    The returned move is the same one recursive_minimax_strategy returns: of
+    the moves with the best score, the greatest one.
+    """
+    workers = PARALLEL_WORKERS if workers is None else workers
+    moves = game.current_state.get_possible_moves()
+    states = [game.current_state.make_move(move) for move in moves]
+    executor = _get_pool(workers, threads)
+    if split_depth == 1:
+        jobs = [executor.submit(_minimax_job, game, state, cached, threads)
+                for state in states]
+        scores = [job.result() for job in jobs]
+    else:
+        # farming out every grandchild of the root, children which are
+        # already over are scored here
+        jobs = [[executor.submit(_minimax_job, game, state.make_move(m),
+                                 cached, threads)
+                 for m in state.get_possible_moves()]
+                if not game.is_over(state) else [] for state in states]
+        scores = [max([-1 * job.result() for job in jobs[i]])
+                  if jobs[i] else _score_terminal(game, states[i])
+                  for i in range(len(states))]
+    return max([(-1 * scores[x], moves[x]) for x in range(len(moves))])[1]
+
+
+def lean_minimax_strategy(game: Game) -> Union[str, int]:
+    """
+    Returns move from given game state iteratively using minimax strategy,
+    keeping only the frames on the path to the state being searched so that
+    memory grows with the depth of the game rather than the size of its tree.
+
+    The returned move is the same one iterative_minimax_strategy returns.
+    Nodes visited, time taken and the largest number of frames alive at once
+    are recorded in SEARCH_REPORTS["lean"].
+    """
+    report = SearchReport()
+    start = time.perf_counter()
+    frames = Stack()
+    frames.add(MinimaxFrame(game.current_state))
+    alive = report.nodes = report.peak_nodes = 1
+    ret = None
+    while not frames.is_empty():
+        curr = frames.remove()
+        move = next(curr.moves, None)
+        # searching the next move of this frame, which stays on the stack
+        # until all of its moves have been scored
+        if move is not None:
+            frames.add(curr)
+            child = curr.value.make_move(move)
+            report.nodes += 1
+            if game.is_over(child):
+                curr.back_up(-1 * _score_terminal(game, child), move)
+            else:
+                frames.add(MinimaxFrame(child, move, curr))
+                alive += 1
+                report.peak_nodes = max(report.peak_nodes, alive)
+        # every move has been scored, so back the score up into the parent and
+        # drop this frame along with its state
+        else:
+            alive -= 1
+            if curr.parent is None:
+                ret = curr.best_move
+            else:
+                curr.parent.back_up(-1 * curr.score, curr.move)
+    report.elapsed = time.perf_counter() - start
+    SEARCH_REPORTS["lean"] = report
+    return ret
+
+
+def _reuse_subtree(root: MCTSNode, game_state: GameState) -> MCTSNode:
+    """
+    Return the node of root or one of its children whose state is game_state,
+    detached from its parent, or a new node if there is none.
+    """
+    for node in [root] + root.children if root is not None else []:
+        if node.value == game_state:
+            node.parent = None
+            return node
+    return MCTSNode(game_state)
+
+
+def _uct_child(node: MCTSNode, exploration: float) -> MCTSNode:
+    """
+    Return the child of node with the highest upper confidence bound.
+    """
+    log_visits = math.log(node.visits)
+    return max(node.children,
+               key=lambda c: c.wins / c.visits +
+               exploration * math.sqrt(log_visits / c.visits))
+
+
+def _playout(game: Game, game_state: GameState, rollout_depth: int = None,
+             rng: random.Random = None) -> float:
+    """
+    Return the outcome of game_state for its current player after playing
+    random moves, drawn from rng or else the random module, until the game is
+    over, or after rollout_depth moves when given, estimating the outcome
+    with rough_outcome().
+    """
+    rng = random if rng is None else rng
+    sign, depth = 1, 0
+    while not game.is_over(game_state):
+        if rollout_depth is not None and depth == rollout_depth:
+            return sign * game_state.rough_outcome()
+        game_state = game_state.make_move(
+            rng.choice(game_state.get_possible_moves()))
+        sign, depth = -1 * sign, depth + 1
+    return sign * _score_terminal(game, game_state)
+
+
+def _grow_tree(game: Game, root: MCTSNode, iterations: int,
+               budget: float, rollout_depth: int, exploration: float,
+               rng: random.Random = None) -> int:
+    """
+    Run up to iterations UCT playouts from root, growing its tree, until
+    budget seconds have passed when given. Moves are expanded and played out
+    at random, drawing from rng or else the random module. Return the number
+    of playouts run.
+    """
+    rng = random if rng is None else rng
+    start, playouts = time.perf_counter(), 0
+    while playouts < iterations and \
+            (budget is None or time.perf_counter() - start < budget):
+        # selecting down the tree through fully expanded nodes
+        node = root
+        while not node.untried and node.children:
+            node = _uct_child(node, exploration)
+        # expanding one untried move
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            child = MCTSNode(node.value.make_move(move), move, node)
+            node.children.append(child)
+            node = child
+        # backing up the playout's outcome, which alternates between players
+        # on the way up
+        outcome = _playout(game, node.value, rollout_depth, rng)
+        while node is not None:
+            node.visits += 1
+            node.wins -= outcome
+            outcome = -1 * outcome
+            node = node.parent
+        playouts += 1
+    return playouts
+
+
+def mcts_strategy(game: Game, iterations: int = MCTS_ITERATIONS,
+                  budget: float = None, rollout_depth: int = None,
+                  exploration: float = MCTS_EXPLORATION) -> Union[str, int]:
+    """
+    Returns move from given game state using Monte Carlo tree search with
+    upper confidence bounds (UCT). Runs iterations playouts, or stops earlier
+    once budget seconds have passed when given. Playouts are cut off after
+    rollout_depth random moves when given (see _playout). The most visited
+    move is returned.
+
+    The subtree of the returned move is kept in MCTS_TREES and reused on the
+    player's next move, and dropped then if it cannot be reused. If no
+    playout could be run within budget, a random legal move is returned.
+    Playouts run and time taken are recorded in SEARCH_REPORTS["mcts"].
+
+    >>> from stonehenge import StonehengeGame
+    >>> mcts_strategy(StonehengeGame(True, 2), budget=0) in range(7)
+    True
+    """
+    report = SearchReport()
+    start = time.perf_counter()
+    player = game.current_state.get_current_player_name()
+    root = _reuse_subtree(MCTS_TREES.pop(player, None), game.current_state)
+    report.nodes = _grow_tree(game, root, iterations, budget, rollout_depth,
+                              exploration)
+    report.elapsed = time.perf_counter() - start
+    SEARCH_REPORTS["mcts"] = report
+    if not root.children:
+        return random.choice(game.current_state.get_possible_moves())
+    best = max(root.children, key=lambda c: c.visits)
+    best.parent = None
+    MCTS_TREES[player] = best
+    return best.move
+
+
+def _mcts_job(game: Game, iterations: int, budget: float,
+              rollout_depth: int, exploration: float, seed: int)\
+        -> Tuple[Dict[Union[str, int], int], int]:
+    """
+    Return the visits of each root move after growing a tree from the current
+    state of game with a random generator of its own seeded with seed, along
+    with the number of playouts run. Run in a worker by
+    parallel_mcts_strategy.
+
+    >>> from stonehenge import StonehengeGame
+    >>> g = StonehengeGame(True, 2)
+    >>> _mcts_job(g, 50, None, None, 1.4, 7) == _mcts_job(g, 50, None, None,
+    ...                                                   1.4, 7)
+    True
+    """
+    root = MCTSNode(game.current_state)
+    playouts = _grow_tree(game, root, iterations, budget, rollout_depth,
+                          exploration, random.Random(seed))
+    return {child.move: child.visits for child in root.children}, playouts
+
+
+def parallel_mcts_strategy(game: Game, workers: int = None,
+                           iterations: int = MCTS_ITERATIONS,
+                           budget: float = None, rollout_depth: int = None,
+                           exploration: float = MCTS_EXPLORATION,
+                           threads: bool = False) -> Union[str, int]:
+    """
+    Returns move from given game state using root-parallel Monte Carlo tree
+    search: each of workers (PARALLEL_WORKERS by default) grows its own tree
+    as mcts_strategy does, with its own random seed, and the visits of the
+    root moves are added up across workers. The most visited move is
+    returned, the greatest one in case of a tie, or a random legal move if
+    no playout could be run within budget.
+
+    Workers are processes, or threads if threads, from a pool started on the
+    first call and kept for later ones. Threads share game, since scoring
+    finished states does not change it.
+    Playouts run by all workers and time taken are recorded in
+    SEARCH_REPORTS["parallel_mcts"].
+    """
+    report = SearchReport()
+    start = time.perf_counter()
+    workers = PARALLEL_WORKERS if workers is None else workers
+    executor = _get_pool(workers, threads)
+    visits = {}
+    jobs = [executor.submit(_mcts_job, game, iterations, budget,
+                            rollout_depth, exploration,
+                            random.randrange(2 ** 32))
+            for _ in range(workers)]
+    for job in jobs:
+        counts, playouts = job.result()
+        report.nodes += playouts
+        for move in counts:
+            visits[move] = visits.get(move, 0) + counts[move]
+    report.elapsed = time.perf_counter() - start
+    SEARCH_REPORTS["parallel_mcts"] = report
+    if not visits:
+        return random.choice(game.current_state.get_possible_moves())
+    return max([(visits[move], move) for move in visits])[1]
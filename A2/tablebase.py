@@ -0,0 +1,285 @@
+"""
+Endgame tablebases for small Stonehenge boards.
+
+A tablebase holds the minimax score and best move of every position reachable
+on a board of one size. Positions which are rotations or reflections of each
+other are stored once, as their canonical representative. Build one by running
+this module with the board size, e.g. python tablebase.py 3
+"""
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from game import Game
+from stonehenge import StonehengeGame, StonehengeState, get_topology
+from stonehenge_bitboard import StonehengeBitState, COUNT_BITS
+from strategy import alphabeta_minimax_strategy, _score_terminal
+
+# magic number, board size and number of slots at the start of every file
+HEADER = struct.Struct("=4sIQ")
+MAGIC = b"STTC"
+# largest board whose positions fit in a 64-bit key
+MAX_SIZE = 3
+# directory holding tablebase files
+TABLEBASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# multiplier used to spread keys over the slots of a file
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def tablebase_path(size: int) -> str:
+    """
+    Return the path of the tablebase file for boards of side-length size.
+
+    >>> os.path.basename(tablebase_path(2))
+    'stonehenge2.tb'
+    """
+    return os.path.join(TABLEBASE_DIR, "stonehenge{}.tb".format(size))
+
+
+def pack_key(state: StonehengeBitState) -> int:
+    """
+    Return state packed into a single integer of at most 64 bits: the player
+    to move, the cells of each player and the ley-lines of each player.
+
+    >>> pack_key(StonehengeBitState(True, 1).make_move(2))
+    5384
+    """
+    cells = len(state.topology.cells)
+    lines = len(state.topology.line_cells)
+    return (int(state.p1_turn) | state.cells1 << 1 |
+            state.cells2 << (1 + cells) | state.lines1 << (1 + 2 * cells) |
+            state.lines2 << (1 + 2 * cells + lines))
+
+
+def unpack_key(size: int, key: int) -> StonehengeBitState:
+    """
+    Return the state of a board of side-length size packed into key.
+
+    >>> s = StonehengeBitState(False, 2).make_move(3).make_move(0)
+    >>> unpack_key(2, pack_key(s)) == s
+    True
+    """
+    topology = get_topology(size)
+    cells = len(topology.cells)
+    lines = len(topology.line_cells)
+    state = StonehengeBitState(bool(key & 1), size)
+    state.cells1 = key >> 1 & ((1 << cells) - 1)
+    state.cells2 = key >> (1 + cells) & ((1 << cells) - 1)
+    state.lines1 = key >> (1 + 2 * cells) & ((1 << lines) - 1)
+    state.lines2 = key >> (1 + 2 * cells + lines) & ((1 << lines) - 1)
+    for i in range(cells):
+        for line in topology.cell_lines[i]:
+            if state.cells1 >> i & 1:
+                state.counts1 += 1 << (COUNT_BITS * line)
+            elif state.cells2 >> i & 1:
+                state.counts2 += 1 << (COUNT_BITS * line)
+    state.zobrist = state.compute_zobrist()
+    return state
+
+
+def _load_checkpoint(path: str, size: int) -> dict:
+    """
+    Return the progress saved in checkpoint file path, or the progress of a
+    build of a board of side-length size which has not started.
+    """
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            return pickle.load(file)
+    starts = [pack_key(StonehengeBitState(True, size).canonical()[0]),
+              pack_key(StonehengeBitState(False, size).canonical()[0])]
+    return {"layers": [starts], "enumerated": False, "solved": {},
+            "next": None}
+
+
+def _save_checkpoint(path: str, progress: dict) -> None:
+    """
+    Save progress to checkpoint file path, replacing it atomically so that an
+    interrupted save leaves the previous checkpoint intact.
+    """
+    with open(path + ".tmp", "wb") as file:
+        pickle.dump(progress, file, pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def build_tablebase(size: int, path: str = None,
+                    report: Callable[[str], None] = print) -> None:
+    """
+    Build the tablebase of every position reachable on a board of side-length
+    size, from either player moving first, and write it to path. Only the
+    canonical representative of each position is enumerated and stored, and
+    its best move is a move of the representative.
+
+    Positions are enumerated one move at a time, then solved retrograde from
+    the last move back to the first. Progress is checkpointed after every
+    layer, so an interrupted build resumes where it stopped. Positions solved
+    per second are passed to report after every layer.
+    """
+    assert 0 < size <= MAX_SIZE, "Tablebases only fit boards up to size " \
+                                 "{}.".format(MAX_SIZE)
+    path = tablebase_path(size) if path is None else path
+    checkpoint = path + ".part"
+    progress = _load_checkpoint(checkpoint, size)
+    layers, solved = progress["layers"], progress["solved"]
+    game = StonehengeGame(True, size)
+    # enumerating every reachable position, one layer per move made
+    start, count = time.perf_counter(), 0
+    while not progress["enumerated"]:
+        layer = set()
+        for key in layers[-1]:
+            state = unpack_key(size, key)
+            for move in state.get_possible_moves():
+                layer.add(pack_key(state.make_move(move).canonical()[0]))
+        if layer:
+            layers.append(sorted(layer))
+            count += len(layer)
+            report("enumerated layer {}: {} positions, {:.0f} positions/"
+                   "second".format(len(layers) - 1, len(layer),
+                                   count / (time.perf_counter() - start)))
+        else:
+            progress["enumerated"] = True
+            progress["next"] = len(layers) - 1
+        _save_checkpoint(checkpoint, progress)
+    # solving layers retrograde, since every child lies in the next layer
+    start, count = time.perf_counter(), 0
+    while progress["next"] >= 0:
+        for key in layers[progress["next"]]:
+            state = unpack_key(size, key)
+            best = (_score_terminal(game, state) if state.is_over() else 0,
+                    -1)
+            for move in state.get_possible_moves():
+                child = solved[pack_key(state.make_move(move).canonical()[0])]
+                score = -1 * ((child & 3) - 1)
+                if best[1] == -1 or (score, move) > best:
+                    best = (score, move)
+            solved[key] = (best[0] + 1) | (best[1] + 1) << 2
+        count += len(layers[progress["next"]])
+        report("solved layer {}: {} positions, {:.0f} positions/second".format(
+            progress["next"], len(layers[progress["next"]]),
+            count / (time.perf_counter() - start)))
+        progress["next"] -= 1
+        _save_checkpoint(checkpoint, progress)
+    _write_tablebase(path, size, solved)
+    os.remove(checkpoint)
+
+
+def _write_tablebase(path: str, size: int, solved: Dict[int, int]) -> None:
+    """
+    Write the entries of solved to path as an open-addressed hash table of
+    keys followed by a byte per key.
+    """
+    # keeping the table between a third and two thirds full
+    bits = max(len(solved) * 3 // 2, 1).bit_length()
+    keys = array("Q", [0]) * (1 << bits)
+    entries = bytearray(1 << bits)
+    for key, entry in solved.items():
+        slot = _slot(key, bits)
+        while keys[slot]:
+            slot = (slot + 1) & ((1 << bits) - 1)
+        # storing key + 1 so that 0 marks an empty slot
+        keys[slot] = key + 1
+        entries[slot] = entry
+    with open(path + ".tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, size, 1 << bits))
+        file.write(keys.tobytes())
+        file.write(entries)
+    os.replace(path + ".tmp", path)
+
+
+def _slot(key: int, bits: int) -> int:
+    """
+    Return the first slot to probe for key in a table of 2 ** bits slots.
+
+    >>> 0 <= _slot(12345, 4) < 16
+    True
+    """
+    return ((key * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> (64 - bits)
+
+
+class Tablebase:
+    """
+    A tablebase file, memory-mapped so that loading it reads nothing up front.
+
+    ===Attributes===
+    size: side-length of the boards in this tablebase
+    slots: number of slots in the hash table of positions
+    """
+    size: int
+    slots: int
+    _map: mmap.mmap
+    _keys: memoryview
+    _entries: memoryview
+
+    def __init__(self, path: str) -> None:
+        """
+        Map the tablebase at path into memory.
+        """
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, self.slots = HEADER.unpack_from(self._map)
+        assert magic == MAGIC, "{} is not a tablebase.".format(path)
+        view = memoryview(self._map)
+        self._keys = view[HEADER.size:HEADER.size + 8 * self.slots].cast("Q")
+        self._entries = view[HEADER.size + 8 * self.slots:]
+
+    def lookup(self, state: StonehengeBitState)\
+            -> Optional[Tuple[int, Optional[int]]]:
+        """
+        Return the minimax score of state for its current player and its best
+        move, which is None if the game is over, or None if state is missing.
+        The best move of the canonical representative of state is translated
+        back to state.
+        """
+        canonical, symmetry = state.canonical()
+        key = pack_key(canonical)
+        slot = _slot(key, self.slots.bit_length() - 1)
+        while self._keys[slot]:
+            if self._keys[slot] == key + 1:
+                entry = self._entries[slot]
+                if not entry >> 2:
+                    return (entry & 3) - 1, None
+                topology = state.topology
+                return ((entry & 3) - 1, topology.transform_move(
+                    (entry >> 2) - 1, topology.inverses[symmetry]))
+            slot = (slot + 1) & (self.slots - 1)
+        return None
+
+
+# tablebases loaded so far by board size, None if there is no file
+TABLEBASES: Dict[int, Optional[Tablebase]] = {}
+
+
+def get_tablebase(size: int) -> Optional[Tablebase]:
+    """
+    Return the tablebase of boards of side-length size, loading it the first
+    time it is requested, or None if it has not been built.
+    """
+    if size not in TABLEBASES:
+        path = tablebase_path(size)
+        TABLEBASES[size] = Tablebase(path) if os.path.exists(path) else None
+    return TABLEBASES[size]
+
+
+def tablebase_strategy(game: Game) -> Union[str, int]:
+    """
+    Return a move for game from the tablebase of its board size, falling back
+    to alphabeta_minimax_strategy for positions which are not in one.
+    """
+    state = game.current_state
+    if isinstance(state, StonehengeState):
+        state = StonehengeBitState.from_state(state)
+    if isinstance(state, StonehengeBitState) and state.size <= MAX_SIZE:
+        tablebase = get_tablebase(state.size)
+        found = tablebase.lookup(state) if tablebase is not None else None
+        if found is not None and found[1] is not None:
+            return found[1]
+    return alphabeta_minimax_strategy(game)
+
+
+if __name__ == "__main__":
+    sizes: List[int] = [int(arg) for arg in sys.argv[1:]] or [1, 2, 3]
+    for board_size in sizes:
+        build_tablebase(board_size)
@@ -0,0 +1,49 @@
+"""
+A module for playing many games of Stonehenge between pairs of strategies
+without any input or output, to compare how often and how quickly they win.
+The games are played by tournament_runner.
+
+Run this module directly to play a tournament, for example:
+
+    python tournament.py h --size 2 --games 1000 --pair ro:mr --pair mc:ab
+"""
+from stonehenge import StonehengeGame, build_topologies
+from strategy import rough_outcome_strategy, recursive_minimax_strategy, \
+    iterative_minimax_strategy, recursive_minimax_table_strategy, \
+    iterative_minimax_table_strategy, alphabeta_minimax_strategy, \
+    iterative_deepening_strategy, parallel_minimax_strategy, \
+    lean_minimax_strategy, mcts_strategy, parallel_mcts_strategy, \
+    inplace_minimax_strategy, inplace_alphabeta_strategy, PARALLEL_WORKERS
+from tablebase import tablebase_strategy
+from tournament_runner import tournament_parser, run_from_args
+
+# games that can be played in a tournament, and the strategies that can play
+# them, named as in game_interface; interactive_strategy is left out since it
+# asks for input
+tournament_games = {'h': StonehengeGame}
+tournament_strategies = {'ro': rough_outcome_strategy,
+                         'mr': recursive_minimax_strategy,
+                         'mi': iterative_minimax_strategy,
+                         'mrt': recursive_minimax_table_strategy,
+                         'mit': iterative_minimax_table_strategy,
+                         'ab': alphabeta_minimax_strategy,
+                         'id': iterative_deepening_strategy,
+                         'mp': parallel_minimax_strategy,
+                         'ml': lean_minimax_strategy,
+                         'mu': inplace_minimax_strategy,
+                         'abu': inplace_alphabeta_strategy,
+                         'tb': tablebase_strategy,
+                         'mc': mcts_strategy,
+                         'pmc': parallel_mcts_strategy}
+
+
+if __name__ == '__main__':
+    parser = tournament_parser(tournament_games, tournament_strategies,
+                               PARALLEL_WORKERS)
+    parser.add_argument("--size", type=int, default=2,
+                        help="side length of the Stonehenge board")
+    args = parser.parse_args()
+    # building every Stonehenge board layout up front rather than mid-game
+    build_topologies()
+    run_from_args(parser, args, tournament_games, tournament_strategies,
+                  {'size': args.size})
@@ -0,0 +1,163 @@
+"""
+Transposition table for caching minimax scores of game states.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# replacement policies supported by TranspositionTable
+POLICIES = ("lru", "depth")
+
+
+class TranspositionTable:
+    """
+    Bounded cache of minimax scores keyed on GameState.table_key(). Scores are
+    from the point of view of the player to move in the stored state.
+
+    With the "lru" policy, the least recently used entry is evicted once the
+    table is full. With the "depth" policy, every key maps to a fixed slot and
+    an occupied slot is only replaced by an entry of at least the same depth,
+    so that results of larger searches are kept.
+
+    ===Attributes===
+    capacity: maximum number of entries held
+    policy: replacement policy, one of POLICIES
+    hits: number of lookups which found a score
+    misses: number of lookups which found nothing
+    evictions: number of entries replaced by a different key
+    """
+    capacity: int
+    policy: str
+    hits: int
+    misses: int
+    evictions: int
+    _entries: 'OrderedDict[Any, int]'
+    _slots: List[Optional[Tuple[Any, int, int]]]
+    _occupied: int
+
+    def __init__(self, capacity: int = 1000000, policy: str = "lru") -> None:
+        """
+        Create an empty TranspositionTable holding at most capacity entries,
+        replaced according to policy.
+
+        >>> t = TranspositionTable(10, "depth")
+        >>> len(t)
+        0
+        """
+        assert capacity > 0, "Capacity must be a positive integer."
+        assert policy in POLICIES, "Policy must be one of {}".format(POLICIES)
+        self.capacity = capacity
+        self.policy = policy
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._entries = OrderedDict()
+        self._slots = [None] * capacity if policy == "depth" else []
+        # number of slots holding an entry, kept by store so that the size of
+        # a "depth" table is never counted by scanning its slots
+        self._occupied = 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of entries held in this table.
+
+        >>> t = TranspositionTable()
+        >>> t.store("a", 1)
+        >>> len(t)
+        1
+        >>> t = TranspositionTable(2, "depth")
+        >>> for key in ["a", "b", "a"]:
+        ...     t.store(key, 0)
+        >>> len(t) == sum([1 for slot in t._slots if slot is not None])
+        True
+        """
+        if self.policy == "lru":
+            return len(self._entries)
+        return self._occupied
+
+    def lookup(self, key: Any) -> Optional[int]:
+        """
+        Return the score stored for key, or None if there is none.
+
+        >>> t = TranspositionTable()
+        >>> t.lookup("a") is None
+        True
+        >>> t.store("a", -1)
+        >>> t.lookup("a")
+        -1
+        >>> t.hits, t.misses
+        (1, 1)
+        """
+        if self.policy == "lru":
+            score = self._entries.get(key)
+            if score is not None:
+                self._entries.move_to_end(key)
+        else:
+            slot = self._slots[hash(key) % self.capacity]
+            score = slot[1] if slot is not None and slot[0] == key else None
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return score
+
+    def store(self, key: Any, score: int, depth: int = 0) -> None:
+        """
+        Store score for key, found by a search of the given depth.
+
+        >>> t = TranspositionTable(1)
+        >>> t.store("a", 1)
+        >>> t.store("b", 0)
+        >>> t.lookup("a") is None, t.lookup("b"), t.evictions
+        (True, 0, 1)
+        >>> t = TranspositionTable(1, "depth")
+        >>> t.store("a", 1, 5)
+        >>> t.store("b", 0, 2)
+        >>> t.lookup("a"), t.lookup("b") is None, t.evictions
+        (1, True, 0)
+        """
+        if self.policy == "lru":
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            elif len(self._entries) >= self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._entries[key] = score
+        else:
+            index = hash(key) % self.capacity
+            slot = self._slots[index]
+            if slot is None:
+                self._slots[index] = (key, score, depth)
+                self._occupied += 1
+            elif slot[0] == key:
+                self._slots[index] = (key, score, depth)
+            elif depth >= slot[2]:
+                self._slots[index] = (key, score, depth)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Remove every entry from this table and reset its counters.
+
+        >>> t = TranspositionTable()
+        >>> t.store("a", 1)
+        >>> t.clear()
+        >>> len(t), t.hits
+        (0, 0)
+        """
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._entries.clear()
+        self._slots = [None] * self.capacity if self.policy == "depth" else []
+        self._occupied = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Return the counters of this table along with its current size.
+
+        >>> TranspositionTable().get_stats()
+        {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0}
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self)}
+
+
+if __name__ == "__main__":
+    from python_ta import check_all
+    check_all(config="a2_pyta.txt")